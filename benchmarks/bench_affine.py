@@ -0,0 +1,44 @@
+import time
+
+import torch
+
+from tuls.torch.layers.affine import Affine
+
+
+def legacy_forward(module, x, dim):
+    # previous Affine.forward with an explicit dim, which skipped its broken search
+    size = x.size()
+    weight = module.weight.view(*[-1 if index == dim else 1 for index in range(len(size))])
+    x = weight*x
+    if module.bias is not None:
+        bias = module.bias.view(*[-1 if index == dim else 1 for index in range(len(size))])
+        x = x+bias
+    return x
+
+
+@torch.no_grad()
+def measure(fn, repeat=2000):
+    for _ in range(20):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter()-start)/repeat*1e6
+
+
+def main():
+    cases = (
+        ('(B, C, H, W)', torch.randn(8, 64, 16, 16), 1),
+        ('(B, T, C)', torch.randn(8, 128, 64), 2)
+    )
+    module = Affine(64)
+    scripted = torch.jit.script(Affine(64))
+    for name, x, dim in cases:
+        torch.testing.assert_close(module(x), legacy_forward(module, x, dim))
+        print(f'{name:<14} legacy   {measure(lambda: legacy_forward(module, x, dim)):8.2f} us')
+        print(f'{name:<14} cached   {measure(lambda: module(x)):8.2f} us')
+        print(f'{name:<14} scripted {measure(lambda: scripted(x)):8.2f} us')
+
+
+if __name__ == '__main__':
+    main()
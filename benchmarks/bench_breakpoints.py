@@ -0,0 +1,61 @@
+import sys
+import time
+
+from tuls.debug.breakpoints import BreakpointManager
+
+
+def hot_loop(n):
+    total = 0
+    for index in range(n):
+        total += index*index
+    return total
+
+
+def other(value):
+    return value+1
+
+
+def measure(fn, repeat=5):
+    return min(_measure(fn) for _ in range(repeat))
+
+
+def _measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter()-start
+
+
+def naive_trace(frame, event, arg):
+    # what a plain settrace debugger does: every line of every function is reported
+    return naive_trace
+
+
+def main(n=1_000_000):
+    baseline = measure(lambda: hot_loop(n))
+    print(f'backend: {"sys.monitoring" if hasattr(sys, "monitoring") else "settrace"}')
+    print(f'{"baseline":<40} {baseline*1000:9.2f} ms')
+
+    def report(name, elapsed):
+        print(f'{name:<40} {elapsed*1000:9.2f} ms ({elapsed/baseline:.2f}x)')
+
+    manager = BreakpointManager()
+    manager.add_breakpoint(other, other.__code__.co_firstlineno+1, condition='value < 0')
+    with manager:
+        report('breakpoint in another function', measure(lambda: hot_loop(n)))
+    manager.clear()
+    manager.add_breakpoint(hot_loop, hot_loop.__code__.co_firstlineno+3, condition='index < 0')
+    with manager:
+        report('false breakpoint inside the loop', measure(lambda: hot_loop(n)))
+    manager.clear()
+    manager.add_breakpoint(hot_loop, hot_loop.__code__.co_firstlineno+1, condition='n < 0')
+    with manager:
+        report('breakpoint before the loop', measure(lambda: hot_loop(n)))
+    manager.clear()
+    sys.settrace(naive_trace)
+    elapsed = measure(lambda: hot_loop(n))
+    sys.settrace(None)
+    report('plain settrace', elapsed)
+
+
+if __name__ == '__main__':
+    main()
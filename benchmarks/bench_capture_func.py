@@ -0,0 +1,54 @@
+import inspect
+import timeit
+
+from tuls.torch.hooks import Hook
+
+
+def legacy_capture(registry, func):
+    # previous capture_func wrapper: signature inspection and binding on every call
+    def wrapper(*args, **kwargs):
+        sig = inspect.signature(func)
+        bound_args = sig.bind_partial(*args, **kwargs)
+        bound_args.apply_defaults()
+        inputs = [bound_args.arguments[param.name] for param in sig.parameters.values()]
+        outputs = func(*inputs)
+        registry['inputs'] = inputs
+        registry['outputs'] = outputs
+        return outputs
+    return wrapper
+
+
+def add_positional(a, b=2, scale=1):
+    return (a+b)*scale
+
+
+def add(a, b=2, *, scale=1):
+    return (a+b)*scale
+
+
+def main(number=200000):
+    hook = Hook()
+    captured = hook.capture_func('add')(add)
+    timed = hook.capture_func('add_timed', timing=True)(add)
+    outputs_only = hook.capture_func('add_outputs', record_inputs=False)(add)
+    with_action = hook.capture_func('add_action', pre_action=lambda *args, **kwargs: (args, kwargs))(add)
+    baseline = timeit.timeit(lambda: add(1, scale=2), number=number)/number*1e9
+    print(f'{"plain call":<36} {baseline:8.0f} ns')
+    legacy = legacy_capture(dict(), add_positional)
+    elapsed = timeit.timeit(lambda: legacy(1, scale=2), number=number)/number*1e9
+    print(f'{"previous capture_func":<36} {elapsed:8.0f} ns  (+{elapsed-baseline:.0f} ns/call)')
+    for name, func in (
+        ('capture_func', captured),
+        ('capture_func(timing=True)', timed),
+        ('capture_func(record_inputs=False)', outputs_only),
+        ('capture_func(pre_action=...)', with_action)
+    ):
+        elapsed = timeit.timeit(lambda: func(1, scale=2), number=number)/number*1e9
+        print(f'{name:<36} {elapsed:8.0f} ns  (+{elapsed-baseline:.0f} ns/call)')
+    with Hook.globally_disabled():
+        elapsed = timeit.timeit(lambda: captured(1, scale=2), number=number)/number*1e9
+        print(f'{"capture_func (disabled)":<36} {elapsed:8.0f} ns  (+{elapsed-baseline:.0f} ns/call)')
+
+
+if __name__ == '__main__':
+    main()
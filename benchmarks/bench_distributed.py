@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import torch
+import torch.distributed as dist
+
+from tuls.debug.hook import catch
+
+FAILING_RANK = 1
+FAILING_STEP = 20
+
+
+def worker(rank, world_size, init_file, distributed, linger, timeout, failures):
+    dist.init_process_group(
+        'gloo',
+        init_method=f'file://{init_file}',
+        rank=rank,
+        world_size=world_size,
+        timeout=timedelta(seconds=timeout)
+    )
+    try:
+        with catch(enabled=False, distributed=distributed):
+            for step in range(1000000):
+                if rank == FAILING_RANK and step == FAILING_STEP:
+                    failures.put(time.time())
+                    raise RuntimeError(f'rank {rank} failed at step {step}.')
+                value = torch.ones(1)
+                dist.all_reduce(value)
+    except RuntimeError:
+        if rank == FAILING_RANK:
+            # the failing rank stays alive for a while, as it does while it is debugged or stuck in its teardown
+            time.sleep(linger)
+
+
+def run(distributed, world_size, linger, timeout):
+    context = multiprocessing.get_context('spawn')
+    failures = context.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        if distributed == 'file':
+            distributed = os.path.join(directory, 'failure')
+        init_file = os.path.join(directory, 'init')
+        processes = [
+            context.Process(target=worker, args=(rank, world_size, init_file, distributed, linger, timeout, failures))
+            for rank in range(world_size)
+        ]
+        for process in processes:
+            process.start()
+        failed_at = failures.get()
+        peers = [process for rank, process in enumerate(processes) if rank != FAILING_RANK]
+        while any(process.is_alive() for process in peers):
+            time.sleep(0.01)
+        elapsed = time.time()-failed_at
+        for process in processes:
+            process.join()
+    return elapsed, [process.exitcode for process in peers]
+
+
+def main(world_size=4, linger=20.0, timeout=60.0):
+    print(f'world size {world_size}, failing rank lingers {linger:.0f} s, collective timeout {timeout:.0f} s')
+    for name, distributed in (('without distributed mode', None), ('file channel', 'file'), ('store channel', True)):
+        elapsed, exit_codes = run(distributed, world_size, linger, timeout)
+        print(f'{name:<28} peers exit {elapsed:7.2f} s after the failure, exit codes {exit_codes}')
+
+
+if __name__ == '__main__':
+    main()
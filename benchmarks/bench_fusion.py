@@ -0,0 +1,53 @@
+import time
+
+import torch
+from torch import nn
+
+from tuls.torch.layers.affine import Affine, LayerScale
+from tuls.torch.layers.fusion import fuse_affine_layers
+
+
+def make_model(num_blocks=8, channels=64):
+    blocks = []
+    for _ in range(num_blocks):
+        blocks.append(nn.Sequential(
+            nn.Conv2d(channels, channels, 3, padding=1),
+            Affine(channels),
+            nn.BatchNorm2d(channels),
+            LayerScale(channels),
+            nn.ReLU()
+        ))
+    model = nn.Sequential(*blocks)
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, (Affine, nn.BatchNorm2d)):
+                module.weight.uniform_(0.5, 1.5)
+                if module.bias is not None:
+                    module.bias.uniform_(-0.5, 0.5)
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.1, 0.1)
+                module.running_var.uniform_(0.5, 1.5)
+    return model.eval()
+
+
+@torch.no_grad()
+def measure(model, x, repeat=50):
+    for _ in range(5):
+        model(x)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model(x)
+    return (time.perf_counter()-start)/repeat*1000
+
+
+def main():
+    model = make_model()
+    x = torch.randn(8, 64, 32, 32)
+    fused, report = fuse_affine_layers(model, example_inputs=(x,))
+    print(f'folded {len(report)} affine layers, numerically equivalent')
+    print(f'{"original":<10} {measure(model, x):8.3f} ms')
+    print(f'{"fused":<10} {measure(fused, x):8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import time
+
+import torch
+from torch import nn
+
+from tuls.torch.hooks import Hook, CapturePolicy
+
+
+def make_model(num_layers=64, width=64):
+    return nn.Sequential(*[nn.Sequential(nn.Linear(width, width), nn.ReLU()) for _ in range(num_layers)])
+
+
+@torch.no_grad()
+def measure(model, x, repeat=200):
+    for _ in range(10):
+        model(x)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model(x)
+    return (time.perf_counter()-start)/repeat*1e6
+
+
+def main():
+    model = make_model()
+    x = torch.randn(4, 64)
+    baseline = measure(model, x)
+    print(f'{"baseline":<32} {baseline:9.1f} us')
+
+    hook = Hook(policy=CapturePolicy(summary=True))
+    for name, module in model.named_modules():
+        if name:
+            hook.capture_module(name, module)
+    print(f'{"captured (summary policy)":<32} {measure(model, x):9.1f} us')
+
+    with Hook.globally_disabled():
+        disabled = measure(model, x)
+        num_hooks = sum(len(module._forward_hooks)+len(module._forward_pre_hooks) for module in model.modules())
+        print(f'{"globally disabled":<32} {disabled:9.1f} us  ({num_hooks} hooks left)')
+
+    print(f'{"re-enabled":<32} {measure(model, x):9.1f} us')
+    hook.release()
+    released = measure(model, x)
+    print(f'{"released":<32} {released:9.1f} us')
+    print(f'disabled overhead vs baseline: {(disabled/baseline-1)*100:+.1f}%')
+
+
+if __name__ == '__main__':
+    main()
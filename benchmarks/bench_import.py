@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+# modules that must stay importable without torch, numpy, cv2 or the tracer UI
+LIGHT_MODULES = (
+    'tuls',
+    'tuls.data',
+    'tuls.data.loaders',
+    'tuls.debug.hook',
+    'tuls.debug.stack_logger',
+    'tuls.metric.logger',
+    'tuls.misc',
+    'tuls.misc.io',
+    'tuls.misc.sequence',
+    'tuls.misc.string'
+)
+HEAVY_MODULES = ('torch', 'numpy', 'cv2', 'InquirerPy', 'beacon', 'curses')
+
+
+def profile_import(module_name):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    if result.returncode != 0:
+        raise ImportError(result.stderr.splitlines()[-1])
+    imported = dict()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line[len('import time:'):].split('|')
+        imported[package.strip()] = int(cumulative)
+    return imported
+
+
+def main():
+    failures = []
+    for module_name in LIGHT_MODULES:
+        try:
+            imported = profile_import(module_name)
+        except ImportError as e:
+            print(f'{module_name:<28} failed: {e}')
+            failures.append(f'{module_name} cannot be imported: {e}')
+            continue
+        heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+        print(f'{module_name:<28} {imported.get(module_name, 0)/1000:8.2f} ms  {", ".join(heavy)}')
+        if heavy:
+            failures.append(f'{module_name} imports {", ".join(heavy)}')
+    if failures:
+        print('\n'.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
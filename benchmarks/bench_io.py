@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+
+from tuls.misc.io import fast_write
+
+
+def baseline_write(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line)
+
+
+def run(name, fn, repeat=3):
+    elapsed = min(_measure(fn) for _ in range(repeat))
+    print(f'{name:<40} {elapsed*1000:9.2f} ms')
+
+
+def _measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter()-start
+
+
+def main(num_lines=1_000_000):
+    lines = [f'{index},{index*0.5},token_{index % 97}\n' for index in range(num_lines)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out', 'bench.txt')
+
+        def write_with(**kwargs):
+            def fn():
+                with fast_write(path, **kwargs) as f:
+                    for line in lines:
+                        f.write(line)
+            return fn
+
+        print(f'{num_lines} small writes')
+        run('open() (previous fast_write)', lambda: baseline_write(path, lines))
+        run('fast_write()', write_with())
+        run('fast_write(atomic=True)', write_with(atomic=True))
+        run('fast_write(atomic=True, fsync=True)', write_with(atomic=True, fsync=True))
+        run('fast_write(background=True)', write_with(background=True))
+        run('fast_write(compression=gzip)', write_with(compression='gzip'))
+        run('fast_write(compression=gzip, level=1)', write_with(compression='gzip', compression_level=1))
+        run('fast_write(background=True, compression=gzip)', write_with(background=True, compression='gzip'))
+
+        # time the producer loop alone: in background mode it only enqueues
+        with fast_write(path, background=True) as f:
+            start = time.perf_counter()
+            for line in lines:
+                f.write(line)
+            print(f'{"background producer loop only":<40} {(time.perf_counter()-start)*1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import cProfile
+import time
+
+from tuls.debug.sampler import SamplingProfiler
+
+
+def fib(n):
+    return n if n < 2 else fib(n-1)+fib(n-2)
+
+
+def workload():
+    total = 0
+    for index in range(20):
+        total += fib(20)+sum(value*value for value in range(20000))
+    return total
+
+
+def measure(fn, repeat=3):
+    return min(_measure(fn) for _ in range(repeat))
+
+
+def _measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter()-start
+
+
+def main():
+    baseline = measure(workload)
+    print(f'{"baseline":<32} {baseline*1000:9.2f} ms')
+    for interval in (0.01, 0.001):
+        profiler = SamplingProfiler(interval=interval)
+        with profiler:
+            elapsed = measure(workload)
+        print(
+            f'{f"SamplingProfiler({interval})":<32} {elapsed*1000:9.2f} ms '
+            f'({elapsed/baseline:.2f}x, {profiler.num_samples} samples)'
+        )
+    profile = cProfile.Profile()
+    profile.enable()
+    elapsed = measure(workload)
+    profile.disable()
+    print(f'{"cProfile":<32} {elapsed*1000:9.2f} ms ({elapsed/baseline:.2f}x)')
+    print(profiler.table(top=5))
+
+
+if __name__ == '__main__':
+    main()
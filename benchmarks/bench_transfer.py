@@ -0,0 +1,54 @@
+import time
+
+import torch
+from torch import nn
+
+from tuls.torch import bulk_transfer, transfer
+
+
+def make_batch(num_tensors=500):
+    return dict(
+        features=[torch.randn(16, 32) for _ in range(num_tensors)],
+        masks=[torch.ones(16, dtype=torch.bool) for _ in range(num_tensors//10)],
+        nested=dict(stats=tuple(torch.randn(8) for _ in range(num_tensors//5)))
+    )
+
+
+def make_model(num_layers=200):
+    return nn.Sequential(*[nn.Linear(32, 32) for _ in range(num_layers)])
+
+
+def per_tensor_transfer(data, dtype):
+    if isinstance(data, torch.Tensor):
+        return data.to(dtype=dtype) if data.is_floating_point() else data
+    elif isinstance(data, dict):
+        return {key: per_tensor_transfer(value, dtype) for key, value in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return type(data)(per_tensor_transfer(value, dtype) for value in data)
+    return data
+
+
+def run(name, fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f'{name:<40} {(time.perf_counter()-start)/repeat*1000:8.3f} ms')
+
+
+def main():
+    batch = make_batch()
+    run('batch: per-tensor .to(float16)', lambda: per_tensor_transfer(batch, torch.float16))
+    run('batch: bulk_transfer(float16)', lambda: bulk_transfer(batch, dtype=torch.float16))
+    run('batch: per-tensor .to(float64)', lambda: per_tensor_transfer(batch, torch.float64))
+    run('batch: bulk_transfer(float64)', lambda: bulk_transfer(batch, dtype=torch.float64))
+    run('model: transfer(dtype=float16)', lambda: transfer([make_model()], dtype=torch.float16), repeat=5)
+    run('model: transfer(dtype=float16, bulk=True)', lambda: transfer([make_model()], dtype=torch.float16, bulk=True), repeat=5)
+    if torch.cuda.is_available():
+        run('batch: per-tensor .to(cuda)', lambda: [tensor.to('cuda') for tensor in batch['features']])
+        run('batch: bulk_transfer(cuda)', lambda: bulk_transfer(batch, device='cuda'))
+        torch.cuda.synchronize()
+
+
+if __name__ == '__main__':
+    main()
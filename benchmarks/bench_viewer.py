@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+
+from tuls.debug.viewer import Buffer, Cursor, MappedFile, SearchIndex
+
+
+def run(name, fn, repeat=3):
+    elapsed = min(_measure(fn) for _ in range(repeat))
+    print(f'{name:<40} {elapsed*1000:9.2f} ms')
+
+
+def _measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter()-start
+
+
+def baseline_edit(lines, num_edits):
+    # list surgery of the previous Buffer: every edit shifts all following lines
+    for row in range(num_edits):
+        current = lines.pop(row)
+        lines.insert(row, current[:3])
+        lines.insert(row+1, current[3:])
+        current = lines.pop(row)
+        lines.insert(row, current+lines.pop(row))
+
+
+def main(num_lines=2_000_000, num_rows=50, num_edits=1000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.log')
+        with open(path, 'w') as f:
+            for index in range(num_lines):
+                f.write(f'{index:>10} | step={index} loss={index*1e-6:.6f} message=token_{index % 97}\n')
+        print(f'{num_lines} lines, {os.path.getsize(path)/2**20:.1f} MB')
+
+        def open_list():
+            with open(path) as f:
+                return Buffer(f.read().splitlines())[:num_rows]
+
+        def open_mapped():
+            mapped_file = MappedFile(path)
+            rows = Buffer(mapped_file)[:num_rows]
+            mapped_file.close()
+            return rows
+
+        run('read().splitlines() + first screen', open_list)
+        run('MappedFile + first screen', open_mapped)
+
+        def edit(mapped_file):
+            buffer = Buffer(mapped_file)
+            for row in range(num_edits):
+                buffer.split(Cursor(row, 3))
+                buffer.backspace(Cursor(row, 3))
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+        run(f'{num_edits} split+join, list (previous)', lambda: baseline_edit(list(lines), num_edits), repeat=1)
+        mapped_file = MappedFile(path)
+        run(f'{num_edits} split+join, piece table', lambda: edit(mapped_file), repeat=1)
+
+        for query, regex in (('token_42', False), (r'loss=1\.\d+', True)):
+            start = time.perf_counter()
+            search = SearchIndex(mapped_file, query, regex=regex)
+            while not search.matches and not search.done:
+                time.sleep(0.001)
+            first = time.perf_counter()-start
+            search.thread.join()
+            print(
+                f'{"search " + query:<40} first match {first*1000:.2f} ms, '
+                f'{len(search.matches)} matches in {(time.perf_counter()-start)*1000:.2f} ms'
+            )
+        mapped_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+from tuls.debug.breakpoints import BreakpointManager
+
+
+def fail(value):
+    value = value+1
+    raise RuntimeError(value)
+
+
+def count(n):
+    total = 0
+    for index in range(n):
+        total += index
+    return total
+
+
+def test_watchpoint_forgets_frames_left_by_exception():
+    hits = []
+    manager = BreakpointManager()
+    watchpoint = manager.add_watchpoint(fail, 'value', action=lambda frame, point, message: hits.append(message))
+    with manager:
+        for index in range(5):
+            try:
+                fail(index)
+            except RuntimeError:
+                pass
+    assert len(hits) == 5
+    assert watchpoint.values == {}
+
+
+def test_breakpoint_added_after_line_was_disabled():
+    hits = []
+    manager = BreakpointManager()
+    action = lambda frame, point, message: hits.append(frame.f_locals['index'])
+    manager.add_breakpoint(count, count.__code__.co_firstlineno+1, condition='False', action=action)
+    with manager:
+        count(3)
+        manager.add_breakpoint(count, count.__code__.co_firstlineno+3, condition='index == 2', action=action)
+        count(3)
+    assert hits == [2]
+
+
+def test_breakpoint_in_running_module_code(tmp_path):
+    path = tmp_path/'script.py'
+    path.write_text(
+        'manager.add_breakpoint(__file__, 4, action=lambda frame, point, message: hits.append(frame.f_lineno))\n'
+        'manager.arm()\n'
+        'for index in range(3):\n'
+        '    index += 1\n'
+        'manager.disarm()\n'
+    )
+    hits = []
+    namespace = dict(manager=BreakpointManager(), hits=hits, __file__=str(path))
+    exec(compile(path.read_text(), str(path), 'exec'), namespace)
+    assert hits == [4, 4, 4]
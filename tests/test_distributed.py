@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+from tuls.debug import distributed
+from tuls.debug.distributed import FailureWatcher, FileChannel, StoreChannel, build_failure_record, get_run_id
+from tuls.debug.hook import catch
+
+
+def make_record(rank, run_id):
+    try:
+        raise RuntimeError(f'rank {rank} failed.')
+    except RuntimeError as e:
+        return build_failure_record(e, rank, run_id=run_id)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time()+timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_records_of_other_runs_are_ignored(tmp_path):
+    FileChannel(str(tmp_path), run_id='old').publish(make_record(1, 'old'))
+    failures = []
+    channel = FileChannel(str(tmp_path), run_id='new')
+    assert not os.path.exists(channel.path)
+    FileChannel(str(tmp_path), run_id='old').publish(make_record(1, 'old'))
+    with FailureWatcher(channel, rank=0, interval=0.01, on_failure=failures.append):
+        time.sleep(0.1)
+        assert failures == []
+        assert channel.publish(make_record(2, 'new'))
+        assert not channel.publish(make_record(3, 'new'))
+        assert wait_for(lambda: failures)
+    assert failures[0]['rank'] == 2 and failures[0]['run_id'] == 'new'
+
+
+class DictStore:
+    def __init__(self):
+        self.values = dict()
+
+    def set(self, key, value):
+        self.values[key] = value.encode() if isinstance(value, str) else value
+
+    def get(self, key):
+        return self.values[key]
+
+    def check(self, keys):
+        return all(key in self.values for key in keys)
+
+    def compare_set(self, key, expected, desired):
+        if self.values.get(key, b'') == expected.encode():
+            self.set(key, desired)
+        return self.values[key]
+
+    def delete_key(self, key):
+        raise RuntimeError('delete_key is not implemented.')
+
+
+def test_store_channel_without_delete_key():
+    store = DictStore()
+    channel = StoreChannel(store, run_id='run')
+    assert StoreChannel(store, run_id='other').poll() is None
+    assert channel.publish(make_record(1, 'run'))
+    assert channel.poll()['rank'] == 1
+    channel.clear()
+    assert channel.poll() is None
+    assert channel.publish(make_record(2, 'run'))
+    assert channel.poll()['rank'] == 2
+
+
+def worker(rank, directory, failures):
+    os.environ.update(RANK=str(rank), TULS_RUN_ID='run')
+    try:
+        with catch(enabled=False, distributed=directory):
+            if rank == 1:
+                time.sleep(0.3)
+                failures.put(time.time())
+                raise RuntimeError('rank 1 failed.')
+            time.sleep(30)
+    except RuntimeError:
+        time.sleep(1)
+
+
+def test_peers_abort_on_failure(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    failures = context.Queue()
+    processes = [context.Process(target=worker, args=(rank, str(tmp_path), failures)) for rank in range(3)]
+    for process in processes:
+        process.start()
+    failed_at = failures.get(timeout=30)
+    for rank in (0, 2):
+        processes[rank].join(timeout=10)
+        assert processes[rank].exitcode == 1
+    assert time.time()-failed_at < 5
+    processes[1].join()
+
+
+def test_run_id_of_launchers(monkeypatch):
+    for name in ('TULS_RUN_ID', 'TORCHELASTIC_RUN_ID', 'TORCHELASTIC_RESTART_COUNT'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(distributed, '_RUN_ID', None)
+    monkeypatch.setenv('TORCHELASTIC_RUN_ID', 'job')
+    monkeypatch.setenv('TORCHELASTIC_RESTART_COUNT', '2')
+    assert get_run_id() == 'job/2'
+    monkeypatch.setattr(distributed, '_RUN_ID', None)
+    monkeypatch.setenv('TORCHELASTIC_RUN_ID', 'none')
+    monkeypatch.setenv('WORLD_SIZE', '4')
+    monkeypatch.setenv('LOCAL_WORLD_SIZE', '2')
+    with pytest.raises(RuntimeError):
+        get_run_id()
+    monkeypatch.setenv('LOCAL_WORLD_SIZE', '4')
+    assert get_run_id() == get_run_id()
+
+
+def store_worker(rank, world_size, init_file, run_ids):
+    import torch
+    import torch.distributed as dist
+
+    for name in ('TULS_RUN_ID', 'TULS_FAILURE_DIR', 'TORCHELASTIC_RUN_ID'):
+        os.environ.pop(name, None)
+    dist.init_process_group(
+        'gloo', init_method=f'file://{init_file}', rank=rank, world_size=world_size, timeout=timedelta(seconds=60)
+    )
+    try:
+        with catch(enabled=False, distributed=True):
+            run_ids.put(get_run_id())
+            for step in range(1000000):
+                if rank == 1 and step == 20:
+                    raise RuntimeError('rank 1 failed.')
+                dist.all_reduce(torch.ones(1))
+    except RuntimeError:
+        if rank == 1:
+            # the failing rank stays alive, so its peers can only leave their all_reduce through the watcher
+            time.sleep(10)
+
+
+def test_peers_abort_through_the_store(tmp_path):
+    torch = pytest.importorskip('torch')
+    if not torch.distributed.is_available():
+        pytest.skip('torch.distributed is not available.')
+    context = multiprocessing.get_context('spawn')
+    run_ids = context.Queue()
+    init_file = str(tmp_path/'init')
+    processes = [context.Process(target=store_worker, args=(rank, 3, init_file, run_ids)) for rank in range(3)]
+    for process in processes:
+        process.start()
+    assert len({run_ids.get(timeout=60) for _ in processes}) == 1
+    started = time.time()
+    for rank in (0, 2):
+        processes[rank].join(timeout=30)
+        assert processes[rank].exitcode == 1
+    assert time.time()-started < 10
+    processes[1].join()
@@ -0,0 +1,34 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch.layers.affine import Affine
+from tuls.torch.layers.fusion import fuse_affine_layers
+
+
+def randomize(affine):
+    with torch.no_grad():
+        affine.weight.uniform_(0.5, 1.5)
+        affine.bias.uniform_(-1, 1)
+    return affine
+
+
+@pytest.mark.parametrize('model, inputs, folded', [
+    (lambda: nn.Sequential(nn.Conv2d(3, 8, 3), randomize(Affine(8))), (2, 3, 10, 10), True),
+    (lambda: nn.Sequential(nn.Conv2d(3, 8, 3), randomize(Affine(8, dim=-1))), (2, 3, 10, 10), False),
+    (lambda: nn.Sequential(nn.Linear(8, 8), randomize(Affine(8))), (2, 8, 8), False),
+    (lambda: nn.Sequential(nn.Linear(8, 8), randomize(Affine(8, dim=-1))), (2, 8, 8), True),
+    (lambda: nn.Sequential(randomize(Affine(8, dim=1)), nn.Linear(8, 4)), (2, 8, 8), False)
+])
+def test_fold_respects_affine_axis(model, inputs, folded):
+    torch.manual_seed(0)
+    model = model().eval()
+    x = torch.randn(*inputs)
+    with torch.no_grad():
+        reference = model(x)
+    for example_inputs in ((x,), None):
+        fused, report = fuse_affine_layers(model, example_inputs=example_inputs)
+        assert bool(report) == folded
+        with torch.no_grad():
+            assert torch.allclose(fused(x), reference, rtol=1e-4, atol=1e-5)
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch.hooks import CapturePolicy, Hook
+
+
+def test_spill_files_are_bounded_by_max_calls(tmp_path):
+    hook = Hook(policy=CapturePolicy(max_calls=2, spill_dir=str(tmp_path)))
+    module = nn.Linear(4, 4)
+    hook.capture_module('linear', module)
+    for _ in range(50):
+        outputs = module(torch.randn(3, 4))
+    entry = hook.get('linear')
+    assert len(os.listdir(tmp_path)) == 4
+    assert [item.call_index for item in entry.history] == [48, 49]
+    assert torch.equal(torch.from_numpy(entry.outputs), outputs.detach())
+    assert torch.equal(torch.from_numpy(entry.history[-1].outputs), outputs.detach())
@@ -0,0 +1,58 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch.layers import LayerConverter
+
+
+class CustomLinear(nn.Linear):
+    pass
+
+
+def test_meta_init_keeps_partially_mapped_tensors():
+    model = nn.Sequential(nn.Linear(4, 3))
+    source = model[0]
+    weight = source.weight.detach().clone()
+    converter = LayerConverter().register(
+        nn.Linear,
+        CustomLinear,
+        init_kwargs_mapping=dict(in_features='in_features', out_features='out_features'),
+        attrs_mapping=dict(weight='weight'),
+        meta_init=True
+    )
+    converted, report = converter.convert(model)
+    layer = converted[0]
+    assert isinstance(layer, CustomLinear)
+    assert report == [('0', 'Linear', 'CustomLinear')]
+    assert torch.equal(layer.weight, weight)
+    assert layer.weight is source.weight
+    assert torch.equal(source.weight, weight)
+    assert not layer.bias.is_meta and layer.bias.device.type == 'cpu'
+
+
+class Wrapper(nn.Module):
+    def __init__(self, in_features, out_features):
+        super().__init__()
+        self.base = nn.Linear(in_features, out_features)
+        self.scale = nn.Parameter(torch.ones(()))
+
+    def forward(self, x):
+        return self.base(x)*self.scale
+
+
+def test_wrapping_rule_converts_each_layer_once():
+    model = nn.Sequential(nn.Linear(4, 4), nn.Sequential(nn.ReLU(), nn.Linear(4, 2)))
+    converter = LayerConverter().register(
+        nn.Linear, Wrapper, init_kwargs_mapping=dict(in_features='in_features', out_features='out_features')
+    )
+    converted, report = converter.convert(model)
+    assert [name for name, _, _ in report] == ['0', '1.1']
+    assert isinstance(converted[0], Wrapper) and type(converted[0].base) is nn.Linear
+    assert isinstance(converted[1][1], Wrapper) and type(converted[1][1].base) is nn.Linear
+
+
+def test_meta_init_without_source_tensors():
+    converter = LayerConverter().register(nn.ReLU, nn.Linear, in_features=2, out_features=2, meta_init=True)
+    converted, _ = converter.convert(nn.Sequential(nn.ReLU()))
+    assert not converted[0].weight.is_meta
@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from tuls.debug.memory import MemoryInspector
+
+
+def test_array_owning_its_data_is_counted_once():
+    array = np.zeros(500_000)
+    sizes = MemoryInspector().measure(array)
+    assert array.nbytes <= sizes['cpu_bytes'] < array.nbytes+1024
+
+
+def test_array_views_share_their_base():
+    array = np.zeros(500_000)
+    sizes = MemoryInspector().measure([array, array[::2], array.reshape(1000, 500)])
+    assert sizes['cpu_bytes'] < array.nbytes+4096
+
+
+def test_arrays_over_one_buffer_are_counted_once():
+    buffer = bytearray(8*500_000)
+    arrays = [np.frombuffer(buffer), np.frombuffer(buffer, offset=8*1000)]
+    sizes = MemoryInspector().measure(arrays)
+    assert len(buffer) <= sizes['cpu_bytes'] < len(buffer)+4096
+
+
+def test_tensor_and_numpy_aliases_are_counted_once():
+    torch = pytest.importorskip('torch')
+    tensor = torch.zeros(500_000, dtype=torch.float64)
+    array = np.ones(500_000)
+    sizes = MemoryInspector().measure([tensor, tensor.numpy(), tensor[1000:].numpy(), array, torch.from_numpy(array)])
+    assert sizes['cpu_bytes'] < 2*array.nbytes+4096
+    assert sizes['device_bytes'] == 0
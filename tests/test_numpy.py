@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch import tensor_to_numpy
+
+
+def test_tensor_to_numpy_rejects_modules():
+    with pytest.raises(TypeError):
+        tensor_to_numpy([torch.ones(2), nn.Linear(2, 2)])
+
+
+def test_tensor_to_numpy_out_skips_non_tensor_leaves():
+    x = dict(step=3, name='batch', values=[torch.arange(3.0), torch.ones(2)])
+    out = dict(step=3, name='batch', values=[np.empty(3, dtype=np.float32), np.empty(2, dtype=np.float32)])
+    result = tensor_to_numpy(x, out=out)
+    assert result['step'] == 3 and result['name'] == 'batch'
+    assert out['values'][0].tolist() == [0.0, 1.0, 2.0]
+    assert out['values'][1].tolist() == [1.0, 1.0]
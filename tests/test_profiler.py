@@ -0,0 +1,32 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch.profiler import ModuleProfiler
+
+
+def make_model():
+    return nn.Sequential(nn.Conv2d(3, 4, 3), nn.BatchNorm2d(4), nn.ReLU(inplace=True), nn.Conv2d(4, 4, 3))
+
+
+def test_backward_with_inplace_modules():
+    model = make_model()
+    profiler = ModuleProfiler().attach(model)
+    model(torch.randn(2, 3, 8, 8, requires_grad=True)).sum().backward()
+    stats = {row.name: row for row in profiler.summary()}
+    assert stats['0'].forward_calls == 1
+    assert stats['0'].backward_calls == 1
+    assert stats['3'].backward_calls == 1
+
+
+def test_unsampled_steps_remove_hooks():
+    model = make_model()
+    profiler = ModuleProfiler(every_n_steps=2).attach(model)
+    profiler.step()
+    assert not model[0]._forward_hooks and not model[0]._forward_pre_hooks
+    model(torch.randn(2, 3, 8, 8))
+    assert profiler.summary() == []
+    profiler.step()
+    model(torch.randn(2, 3, 8, 8))
+    assert {row.name: row for row in profiler.summary()}['0'].forward_calls == 1
@@ -0,0 +1,22 @@
+import random
+
+import pytest
+
+from tuls.misc.sequence import sample_by_ratio, stream_sample_by_ratio
+
+
+def test_sample_by_ratio_follows_random_seed():
+    random.seed(0)
+    first = sample_by_ratio(list(range(100)), 0.1)
+    random.seed(0)
+    assert sample_by_ratio(list(range(100)), 0.1) == first
+
+
+def test_weighted_sample_shrinks_to_nonzero_weights():
+    pytest.importorskip('numpy')
+    assert sample_by_ratio(list(range(10)), 0.5, sort=True, weights=[1, 1]+[0]*8) == [0, 1]
+
+
+def test_stream_sample_by_ratio_checks_ratio_eagerly():
+    with pytest.raises(ValueError):
+        stream_sample_by_ratio(range(10), 2)
@@ -0,0 +1,42 @@
+import json
+import sys
+
+import pytest
+
+from tuls.debug.hook import catch
+from tuls.debug.snapshot import build_snapshot
+
+
+def test_snapshot_bounds_long_source_lines(tmp_path):
+    path = tmp_path/'generated.py'
+    path.write_text(f'value = "{"x"*5_000_000}"\ndef fail():\n    raise RuntimeError("failed")\n')
+    namespace = dict()
+    exec(compile(path.read_text(), str(path), 'exec'), namespace)
+    try:
+        namespace['fail']()
+    except RuntimeError as e:
+        snapshot = build_snapshot(e, byte_budget=1 << 16)
+    assert len(json.dumps(snapshot)) < 1 << 17
+    assert snapshot['frames'][-1]['function'] == 'fail'
+
+
+def test_catch_without_stdin(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', None)
+    with pytest.raises(ZeroDivisionError):
+        with catch(snapshot_path=str(tmp_path/'snapshot.json.gz')):
+            1/0
+    assert (tmp_path/'snapshot.json.gz').exists()
+
+
+def test_catch_writes_snapshots_only_when_asked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('TULS_SNAPSHOT_DIR', raising=False)
+    with pytest.raises(ZeroDivisionError):
+        with catch(headless=True):
+            1/0
+    assert list(tmp_path.iterdir()) == []
+    monkeypatch.setenv('TULS_SNAPSHOT_DIR', str(tmp_path/'snapshots'))
+    with pytest.raises(ZeroDivisionError):
+        with catch(headless=True):
+            1/0
+    assert len(list((tmp_path/'snapshots').iterdir())) == 1
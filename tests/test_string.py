@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from tuls.misc.string import LiteralType, classify_literal, classify_literals
+
+
+def test_classify_literals_matches_scalar():
+    strings = ['1', '-2.5', '0x1F', 'True', 'None', 'name', '1', 'name', '', 'inf']
+    categories, values = classify_literals(strings, return_values=True)
+    for string, category, value in zip(strings, categories, values):
+        assert (category, value) == classify_literal(string, return_value=True)
+    assert categories.tolist() == [classify_literal(string) for string in strings]
+
+
+def test_classify_literals_keeps_shape():
+    strings = np.array([['1', 'a'], ['0x2', 'False']])
+    categories = classify_literals(strings)
+    assert categories.shape == (2, 2)
+    assert categories.tolist() == [[LiteralType.INT, LiteralType.STRING], [LiteralType.HEX, LiteralType.BOOL]]
+    assert classify_literals([]).shape == (0,)
+
+
+def test_classify_literals_rejects_non_strings():
+    for strings in (['1', None], ['1', 1]):
+        with pytest.raises(TypeError):
+            classify_literals(strings)
@@ -0,0 +1,40 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+from torch import nn
+
+from tuls.torch import transfer
+
+
+def make_inputs():
+    torch.manual_seed(0)
+    return [
+        torch.randn(4, 3),
+        torch.arange(5),
+        torch.ones(3, dtype=torch.bool),
+        nn.BatchNorm1d(3)
+    ]
+
+
+@pytest.mark.parametrize('dtype', [torch.float16, torch.float64])
+def test_bulk_transfer_matches_per_tensor(dtype):
+    expected = transfer(make_inputs(), dtype=dtype)
+    results = transfer(make_inputs(), dtype=dtype, bulk=True)
+    for result, reference in zip(results, expected):
+        if isinstance(reference, nn.Module):
+            result, reference = result.state_dict(), reference.state_dict()
+            assert result.keys() == reference.keys()
+            pairs = [(result[key], reference[key]) for key in reference]
+        else:
+            pairs = [(result, reference)]
+        for tensor, reference_tensor in pairs:
+            assert tensor.dtype == reference_tensor.dtype
+            assert torch.equal(tensor, reference_tensor)
+
+
+def test_bulk_transfer_converts_gradients():
+    module = nn.Linear(3, 2)
+    module(torch.randn(4, 3)).sum().backward()
+    transfer([module], dtype=torch.float64, bulk=True)
+    assert module.weight.grad.dtype == torch.float64
+    assert module.bias.grad.dtype == torch.float64
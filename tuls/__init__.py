@@ -1 +1,12 @@
+import importlib
+
 __version__ = '0.4.0b1'
+
+_SUBMODULES = ('data', 'debug', 'metric', 'misc', 'torch')
+
+
+# submodules are resolved on attribute access, so `import tuls` never pulls in torch or the tracer UI
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,6 +1,5 @@
 import glob
 import os
-import cv2
 from typing import overload
 
 from tuls.data.constants import IMAGE_EXTENSIONS
@@ -26,6 +25,8 @@ def extract_images_from_video(source, output_dir, num_frames):
 
 
 def extract_images_from_video(source, output_dir, sampling_rate=None, num_frames=None):
+    import cv2
+
     os.makedirs(output_dir, exist_ok=True)
     video = cv2.VideoCapture(source)
     frames = []
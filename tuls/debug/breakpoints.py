@@ -0,0 +1,319 @@
+import dis
+import gc
+import inspect
+import os
+import sys
+import threading
+import types
+
+_MISSING = object()
+
+
+def _iter_codes(code):
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _iter_codes(const)
+
+
+def _code_of(target):
+    if inspect.ismethod(target):
+        target = target.__func__
+    if isinstance(target, types.FunctionType):
+        return target.__code__
+    if isinstance(target, types.CodeType):
+        return target
+    raise TypeError(f'target should be a function, method or code object, but {target} is not.')
+
+
+def _codes_in_file(filename):
+    # every function object alive in the process is checked once, nested code objects are reached through co_consts
+    filename = os.path.abspath(filename)
+    absolute_paths = dict()
+    roots = set()
+
+    def add(code):
+        if code.co_filename not in absolute_paths:
+            absolute_paths[code.co_filename] = os.path.abspath(code.co_filename)
+        if absolute_paths[code.co_filename] == filename:
+            roots.add(code)
+
+    for obj in gc.get_objects():
+        if isinstance(obj, types.FunctionType):
+            add(obj.__code__)
+    # module-level code has no function object, it can only be hit again while its frame is still running
+    for frame in sys._current_frames().values():
+        while frame is not None:
+            add(frame.f_code)
+            frame = frame.f_back
+    return {code for root in roots for code in _iter_codes(root)}
+
+
+def _line_numbers(code):
+    return {lineno for _, lineno in dis.findlinestarts(code) if lineno is not None}
+
+
+def _parse_location(location, lineno):
+    if isinstance(location, str):
+        if lineno is None:
+            location, _, lineno = location.rpartition(':')
+        return _codes_in_file(location), int(lineno)
+    if lineno is None:
+        raise ValueError(f'lineno should be given for {location}, but None is not.')
+    return set(_iter_codes(_code_of(location))), lineno
+
+
+def _compile_condition(condition):
+    if condition is None or callable(condition):
+        return condition
+    code = compile(condition, '<condition>', 'eval')
+    return lambda frame: eval(code, frame.f_globals, frame.f_locals)
+
+
+def _default_action(frame, point, message):
+    from tuls.debug.trace import print_system_log, trace
+
+    print_system_log(message)
+    trace(frame)
+
+
+class Breakpoint:
+    def __init__(self, codes, lineno, condition=None, action=None):
+        self.codes = codes
+        self.lineno = lineno
+        self.condition = _compile_condition(condition)
+        self.action = action or _default_action
+        self.enabled = True
+        self.hits = 0
+
+    def check(self, frame):
+        if not self.enabled:
+            return
+        self.hits += 1
+        if self.condition is None or self.condition(frame):
+            info = f'Breakpoint hit: {frame.f_code.co_filename} | Line {self.lineno}'
+            self.action(frame, self, info)
+
+
+class Watchpoint:
+    def __init__(self, codes, name, condition=None, action=None):
+        self.codes = codes
+        self.name = name
+        self.condition = _compile_condition(condition)
+        self.action = action or _default_action
+        self.enabled = True
+        self.hits = 0
+        # frame id -> last seen value, reset whenever a watched code object starts a new call
+        self.values = dict()
+
+    def start(self, frame):
+        self.values[id(frame)] = frame.f_locals.get(self.name, _MISSING)
+
+    def finish(self, frame):
+        self.values.pop(id(frame), None)
+
+    def check(self, frame):
+        if not self.enabled:
+            return
+        value = frame.f_locals.get(self.name, _MISSING)
+        old = self.values.get(id(frame), _MISSING)
+        self.values[id(frame)] = value
+        if value is old:
+            return
+        try:
+            changed = bool(value != old)
+        except Exception:
+            changed = True
+        if changed:
+            self.hits += 1
+            if self.condition is None or self.condition(frame):
+                old = 'undefined' if old is _MISSING else repr(old)
+                value = 'undefined' if value is _MISSING else repr(value)
+                info = f'Watchpoint hit: {self.name} changed from {old} to {value} at Line {frame.f_lineno}'
+                self.action(frame, self, info)
+
+
+class BreakpointManager:
+    def __init__(self):
+        self.breakpoints = []
+        self.watchpoints = []
+        # (code, line) -> breakpoints and code -> watchpoints, the only places events are ever delivered to
+        self.lines = dict()
+        self.watches = dict()
+        self.instrumented = set()
+        self.armed = False
+        self.tool_id = None
+        self.previous_trace = None
+        # PEP 669 instruments only the targeted code objects, settrace is the fallback before 3.12
+        self.use_monitoring = hasattr(sys, 'monitoring')
+
+    def add_breakpoint(self, location, lineno=None, condition=None, action=None):
+        codes, lineno = _parse_location(location, lineno)
+        codes = {code for code in codes if lineno in _line_numbers(code)}
+        if not codes:
+            raise ValueError(f'location should point to an executable line of loaded code, but {location} is not.')
+        breakpoint = Breakpoint(codes, lineno, condition=condition, action=action)
+        self.breakpoints.append(breakpoint)
+        self._rebuild()
+        return breakpoint
+
+    def add_watchpoint(self, target, name, condition=None, action=None):
+        watchpoint = Watchpoint({_code_of(target)}, name, condition=condition, action=action)
+        self.watchpoints.append(watchpoint)
+        self._rebuild()
+        return watchpoint
+
+    def remove(self, point):
+        if point in self.breakpoints:
+            self.breakpoints.remove(point)
+        elif point in self.watchpoints:
+            self.watchpoints.remove(point)
+        self._rebuild()
+
+    def clear(self):
+        self.breakpoints.clear()
+        self.watchpoints.clear()
+        self._rebuild()
+
+    def _rebuild(self):
+        self.lines.clear()
+        self.watches.clear()
+        for breakpoint in self.breakpoints:
+            for code in breakpoint.codes:
+                self.lines.setdefault((code, breakpoint.lineno), []).append(breakpoint)
+        for watchpoint in self.watchpoints:
+            for code in watchpoint.codes:
+                self.watches.setdefault(code, []).append(watchpoint)
+        if self.armed:
+            self._instrument()
+
+    def codes(self):
+        return {code for code, _ in self.lines} | set(self.watches)
+
+    def _on_line(self, frame, breakpoints, watchpoints):
+        for breakpoint in breakpoints or []:
+            breakpoint.check(frame)
+        for watchpoint in watchpoints or []:
+            watchpoint.check(frame)
+
+    def _on_start(self, frame, code):
+        for watchpoint in self.watches.get(code, []):
+            watchpoint.start(frame)
+
+    def _on_return(self, frame, code):
+        for watchpoint in self.watches.get(code, []):
+            watchpoint.finish(frame)
+
+    def _monitoring_line(self, code, lineno):
+        breakpoints = self.lines.get((code, lineno))
+        watchpoints = self.watches.get(code)
+        if breakpoints is None and watchpoints is None:
+            # lines without a breakpoint are switched off individually, so they never call back again
+            return sys.monitoring.DISABLE
+        self._on_line(sys._getframe(1), breakpoints, watchpoints)
+
+    def _monitoring_start(self, code, offset):
+        self._on_start(sys._getframe(1), code)
+
+    def _monitoring_return(self, code, offset, value):
+        self._on_return(sys._getframe(1), code)
+
+    def _monitoring_unwind(self, code, offset, exception):
+        # a watched frame left by an exception never returns, its last value is dropped here instead
+        if code in self.watches:
+            self._on_return(sys._getframe(1), code)
+
+    def _acquire_tool(self):
+        monitoring = sys.monitoring
+        for tool_id in (monitoring.DEBUGGER_ID,)+tuple(range(6)):
+            if monitoring.get_tool(tool_id) is None:
+                monitoring.use_tool_id(tool_id, 'tuls')
+                return tool_id
+        raise RuntimeError('sys.monitoring has no free tool id.')
+
+    def _instrument(self):
+        if self.use_monitoring:
+            monitoring, events = sys.monitoring, sys.monitoring.events
+            for code in self.instrumented:
+                monitoring.set_local_events(self.tool_id, code, events.NO_EVENTS)
+            # clearing and setting again re-enables the lines this tool disabled, which may hold new breakpoints now,
+            # without restart_events re-enabling what other tools disabled
+            for code in self.codes():
+                code_events = events.LINE
+                if code in self.watches:
+                    code_events |= events.PY_START | events.PY_RETURN
+                monitoring.set_local_events(self.tool_id, code, code_events)
+            # unwinding cannot be monitored per code object, it is only on while there are watchpoints
+            monitoring.set_events(self.tool_id, events.PY_UNWIND if self.watches else events.NO_EVENTS)
+        else:
+            # frames already running in the current thread only see line events once their f_trace is set
+            frame = sys._getframe()
+            codes = self.codes()
+            while frame is not None:
+                if frame.f_code in codes:
+                    frame.f_trace = self._settrace_local
+                frame = frame.f_back
+        self.instrumented = self.codes()
+
+    def _settrace_global(self, frame, event, arg):
+        if frame.f_code not in self.instrumented:
+            return None
+        self._on_start(frame, frame.f_code)
+        return self._settrace_local
+
+    def _settrace_local(self, frame, event, arg):
+        if event == 'line':
+            code = frame.f_code
+            breakpoints = self.lines.get((code, frame.f_lineno))
+            watchpoints = self.watches.get(code)
+            if breakpoints is not None or watchpoints is not None:
+                self._on_line(frame, breakpoints, watchpoints)
+        elif event == 'return':
+            self._on_return(frame, frame.f_code)
+        return self._settrace_local
+
+    def arm(self):
+        if self.armed:
+            return self
+        self.instrumented = set()
+        if self.use_monitoring:
+            self.tool_id = self._acquire_tool()
+            events = sys.monitoring.events
+            sys.monitoring.register_callback(self.tool_id, events.LINE, self._monitoring_line)
+            sys.monitoring.register_callback(self.tool_id, events.PY_START, self._monitoring_start)
+            sys.monitoring.register_callback(self.tool_id, events.PY_RETURN, self._monitoring_return)
+            sys.monitoring.register_callback(self.tool_id, events.PY_UNWIND, self._monitoring_unwind)
+        else:
+            self.previous_trace = sys.gettrace()
+            sys.settrace(self._settrace_global)
+            threading.settrace(self._settrace_global)
+        self.armed = True
+        self._instrument()
+        return self
+
+    def disarm(self):
+        if not self.armed:
+            return self
+        if self.use_monitoring:
+            for code in self.instrumented:
+                sys.monitoring.set_local_events(self.tool_id, code, sys.monitoring.events.NO_EVENTS)
+            sys.monitoring.set_events(self.tool_id, sys.monitoring.events.NO_EVENTS)
+            sys.monitoring.free_tool_id(self.tool_id)
+            self.tool_id = None
+        else:
+            frame = sys._getframe()
+            while frame is not None:
+                if frame.f_code in self.instrumented:
+                    frame.f_trace = None
+                frame = frame.f_back
+            sys.settrace(self.previous_trace)
+            threading.settrace(self.previous_trace)
+        self.instrumented = set()
+        self.armed = False
+        return self
+
+    def __enter__(self):
+        return self.arm()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.disarm()
@@ -0,0 +1,84 @@
+import inspect
+import os
+
+from beacon.adict import ADict
+
+from tuls.debug.viewer import MappedFile
+
+
+def _code_of(obj):
+    if inspect.istraceback(obj):
+        obj = obj.tb_frame
+    if inspect.isframe(obj):
+        return obj.f_code
+    return obj
+
+
+class SourceCache:
+    def __init__(self):
+        # frame -> info, object -> (source lines, first line number), (object, query) -> highlights, path -> mapped file
+        self.frame_infos = dict()
+        self.sources = dict()
+        self.searches = dict()
+        self.files = dict()
+
+    def frame_info(self, frame):
+        if frame not in self.frame_infos:
+            # metadata comes straight from the code object, reading source is left to source_lines
+            lineno = frame.tb_lineno if inspect.istraceback(frame) else None
+            frame = frame.tb_frame if inspect.istraceback(frame) else frame
+            code = frame.f_code
+            self.frame_infos[frame] = ADict(
+                filename=code.co_filename,
+                lineno=frame.f_lineno if lineno is None else lineno,
+                function=code.co_name
+            )
+        return self.frame_infos[frame]
+
+    def frame_label(self, frame):
+        frame_info = self.frame_info(frame)
+        return f'{frame_info.filename} | Line {frame_info.lineno}'
+
+    def _key(self, obj):
+        obj = _code_of(obj)
+        try:
+            hash(obj)
+        except TypeError:
+            return id(obj)
+        return obj
+
+    def source_lines(self, obj):
+        key = self._key(obj)
+        if key not in self.sources:
+            if hasattr(obj, 'snapshot_source'):
+                # frames loaded from a snapshot carry their own source context
+                self.sources[key] = obj.snapshot_source
+                return self.sources[key]
+            lines, start = inspect.getsourcelines(_code_of(obj))
+            self.sources[key] = (''.join(lines)[:-1].split('\n'), max(start, 1))
+        return self.sources[key]
+
+    def search(self, obj, query):
+        key = (self._key(obj), query)
+        if key not in self.searches:
+            highlights = dict()
+            for index, line in enumerate(self.source_lines(obj)[0] if query else []):
+                if query in line:
+                    highlights[index] = []
+                    for sub_index, sub_line in enumerate(line.split(query)):
+                        if sub_index != 0:
+                            highlights[index].append(('#71ADFF', query))
+                        highlights[index].append(('', sub_line))
+            self.searches[key] = highlights
+        return self.searches[key]
+
+    def mapped_file(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if file_path not in self.files:
+            self.files[file_path] = MappedFile(file_path)
+        return self.files[file_path]
+
+    def close(self):
+        for mapped_file in self.files.values():
+            mapped_file.close()
+        self.files.clear()
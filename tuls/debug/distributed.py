@@ -0,0 +1,267 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_MAX_MESSAGE = 2000
+FAILURE_KEY = 'tuls/failure'
+
+
+def _rank_and_world_size():
+    dist = sys.modules.get('torch.distributed')
+    if dist is not None and dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return int(os.environ.get('RANK', 0)), int(os.environ.get('WORLD_SIZE', 1))
+
+
+_RUN_ID = None
+
+
+def get_run_id():
+    global _RUN_ID
+    if _RUN_ID is not None:
+        return _RUN_ID
+    dist = sys.modules.get('torch.distributed')
+    if 'TULS_RUN_ID' in os.environ:
+        _RUN_ID = os.environ['TULS_RUN_ID']
+    elif os.environ.get('TORCHELASTIC_RUN_ID', 'none') != 'none':
+        # the store of an elastic agent outlives restarts, so attempts are told apart by the restart count instead
+        _RUN_ID = f'{os.environ["TORCHELASTIC_RUN_ID"]}/{os.environ.get("TORCHELASTIC_RESTART_COUNT", 0)}'
+    elif dist is not None and dist.is_available() and dist.is_initialized():
+        # the first rank to get here draws the token into the store of the process group and the others read it,
+        # so no rank waits for another one, the store of a group without an elastic agent lives as long as the job
+        store = dist.distributed_c10d._get_default_store()
+        _RUN_ID = store.compare_set(f'{FAILURE_KEY}/run_id', '', uuid.uuid4().hex).decode()
+    else:
+        _, world_size = _rank_and_world_size()
+        local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+        if local_world_size < world_size:
+            raise RuntimeError(
+                f'TULS_RUN_ID should be set when ranks on several hosts share a failure channel, '
+                f'but it is not and only {local_world_size} of {world_size} ranks run on this host.'
+            )
+        # local workers share their launcher, this only tells runs apart on a single node
+        _RUN_ID = f'{socket.gethostname()}/{os.getppid()}'
+    return _RUN_ID
+
+
+def build_failure_record(exc_value, rank, run_id=None, max_message=DEFAULT_MAX_MESSAGE, snapshot_path=None):
+    frames = traceback.extract_tb(exc_value.__traceback__)
+    location = f'{frames[-1].filename}:{frames[-1].lineno} in {frames[-1].name}' if frames else None
+    return dict(
+        run_id=run_id,
+        rank=rank,
+        host=socket.gethostname(),
+        pid=os.getpid(),
+        time=time.time(),
+        exception_type=exc_value.__class__.__name__,
+        message=str(exc_value)[:max_message],
+        location=location,
+        snapshot_path=snapshot_path
+    )
+
+
+class FileChannel:
+    def __init__(self, directory, name='failure.json', run_id=None):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self.run_id = get_run_id() if run_id is None else run_id
+        self._clear_stale()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f), os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            return None, None
+
+    def _clear_stale(self):
+        # records of earlier runs are removed however recent they are, unless a new record has replaced them since
+        record, inode = self._read()
+        if record is not None and record.get('run_id') != self.run_id:
+            try:
+                if os.stat(self.path).st_ino == inode:
+                    os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def publish(self, record):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f'.{os.path.basename(self.path)}.{uuid.uuid4().hex}.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(record, f, separators=(',', ':'))
+        try:
+            # linking fails when a record is already there, so the first failure is the one every rank sees
+            os.link(temp_path, self.path)
+            return True
+        except FileExistsError:
+            current, _ = self._read()
+            if current is not None and current.get('run_id') == record['run_id']:
+                return False
+            os.replace(temp_path, self.path)
+            return True
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def poll(self):
+        record, _ = self._read()
+        return record if record is not None and record.get('run_id') == self.run_id else None
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class StoreChannel:
+    def __init__(self, store, key=FAILURE_KEY, run_id=None):
+        self.store = store
+        self.run_id = get_run_id() if run_id is None else run_id
+        # the key is scoped to the run, so a store outliving a job never hands out the record of an earlier one
+        self.key = f'{key}/{self.run_id}'
+
+    def publish(self, record):
+        value = json.dumps(record, separators=(',', ':'))
+        # an empty expected value sets the key only when it is missing or cleared, so the first failure wins
+        return self.store.compare_set(self.key, '', value).decode() == value
+
+    def poll(self):
+        if not self.store.check([self.key]):
+            return None
+        value = self.store.get(self.key).decode()
+        return json.loads(value) if value else None
+
+    def clear(self):
+        try:
+            self.store.delete_key(self.key)
+        except (RuntimeError, NotImplementedError):
+            # FileStore and HashStore of older torch cannot delete keys, an empty value reads as no record
+            self.store.set(self.key, '')
+
+
+def get_channel(channel=True):
+    if isinstance(channel, str):
+        return FileChannel(channel)
+    elif channel is not True:
+        return channel
+    if 'TULS_FAILURE_DIR' in os.environ:
+        return FileChannel(os.environ['TULS_FAILURE_DIR'])
+    import torch.distributed as dist
+
+    if not dist.is_initialized():
+        raise RuntimeError('torch.distributed should be initialized before a failure channel is created from it.')
+    # the store the process group was rendezvoused with is already shared by every rank of the job
+    return StoreChannel(dist.distributed_c10d._get_default_store())
+
+
+def format_stacks(limit=None, skip_thread_ids=()):
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id in skip_thread_ids:
+            continue
+        lines.append(f'Thread {names.get(thread_id, thread_id)}:')
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frame, limit=limit))
+    return '\n'.join(lines)
+
+
+class FailureWatcher:
+    def __init__(
+        self,
+        channel=True,
+        rank=None,
+        interval=DEFAULT_INTERVAL,
+        max_errors=3,
+        stack_limit=20,
+        dump_path=None,
+        exit_code=1,
+        on_failure=None
+    ):
+        self.channel = get_channel(channel)
+        self.rank = _rank_and_world_size()[0] if rank is None else rank
+        self.interval = interval
+        self.max_errors = max_errors
+        self.stack_limit = stack_limit
+        self.dump_path = dump_path
+        self.exit_code = exit_code
+        self.on_failure = on_failure or self.abort
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _run(self):
+        errors = 0
+        while not self._stopped.wait(self.interval):
+            try:
+                record = self.channel.poll()
+                errors = 0
+            except Exception as e:
+                # the store lives in one of the ranks, when it is gone that rank has most likely died
+                errors += 1
+                if errors < self.max_errors:
+                    continue
+                record = dict(rank=None, exception_type=e.__class__.__name__, message=f'failure channel is lost: {e}')
+            # the channel only hands out records of this run, so any record of another rank is a peer failure
+            if record is not None and record['rank'] != self.rank:
+                if not self._stopped.is_set():
+                    self.on_failure(record)
+                return
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError('FailureWatcher is already running.')
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='FailureWatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def report(self, exc_value, snapshot_path=None):
+        self.stop()
+        record = build_failure_record(exc_value, self.rank, run_id=self.channel.run_id, snapshot_path=snapshot_path)
+        try:
+            self.channel.publish(record)
+        except Exception:
+            print(f'[!] Rank {self.rank} failed to publish failure:\n{traceback.format_exc()}', file=sys.stderr)
+        return record
+
+    def abort(self, record):
+        failed_rank = 'unknown rank' if record['rank'] is None else f'rank {record["rank"]}'
+        header = (
+            f'[!] Rank {self.rank} aborts, {failed_rank} failed with {record["exception_type"]}: {record["message"]}'
+        )
+        if record.get('location'):
+            header += f'\n    at {record["location"]} on {record["host"]} (pid {record["pid"]})'
+        if record.get('snapshot_path'):
+            header += f'\n    snapshot: {record["snapshot_path"]}'
+        stacks = format_stacks(limit=self.stack_limit, skip_thread_ids=(threading.get_ident(),))
+        text = f'{header}\nStacks of rank {self.rank}:\n{stacks}\n'
+        try:
+            sys.stderr.write(text)
+            if self.dump_path is not None:
+                with open(self.dump_path, 'w') as f:
+                    f.write(text)
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            # the main thread may be stuck inside a collective, only leaving the process skips its timeout
+            os._exit(self.exit_code)
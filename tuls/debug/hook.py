@@ -1,19 +1,59 @@
+import os
 import sys
 import traceback
 from contextlib import contextmanager
 
-from tuls.debug.trace import trace, print_with_split, print_system_log
+# the tracer pulls in InquirerPy, beacon and curses, so it is imported only when needed
+_TRACE_ATTRIBUTES = ('trace', 'print_with_split', 'print_system_log')
+# headless runs write snapshots only when a path is given or this variable names their directory
+SNAPSHOT_DIR_VARIABLE = 'TULS_SNAPSHOT_DIR'
+
+
+def __getattr__(name):
+    if name in _TRACE_ATTRIBUTES:
+        from tuls.debug import trace as trace_module
+        return getattr(trace_module, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 @contextmanager
-def catch(enabled=True):
+def catch(enabled=True, headless=None, snapshot_path=None, distributed=None, **snapshot_kwargs):
+    watcher = None
+    if distributed:
+        # peers that fail make this rank abort instead of waiting out the timeout of its next collective
+        from tuls.debug.distributed import FailureWatcher
+
+        watcher = FailureWatcher(distributed).start()
     try:
         yield
     except Exception as e:
-        if enabled:
+        # without a terminal the interactive tracer would block forever, so only an opted-in snapshot is written
+        if headless is None:
+            # daemons and some launchers run with sys.stdin or sys.stdout set to None
+            headless = not all(getattr(stream, 'isatty', lambda: False)() for stream in (sys.stdin, sys.stdout))
+        snapshot = enabled and headless and (snapshot_path is not None or SNAPSHOT_DIR_VARIABLE in os.environ)
+        if snapshot and snapshot_path is None:
+            from tuls.debug.snapshot import default_snapshot_path
+
+            snapshot_path = default_snapshot_path(os.environ[SNAPSHOT_DIR_VARIABLE])
+        if watcher is not None:
+            watcher.report(e, snapshot_path=snapshot_path if snapshot else None)
+        if snapshot:
+            from tuls.debug.snapshot import save_snapshot
+
+            try:
+                path = save_snapshot(e, snapshot_path, skip_frames=1, **snapshot_kwargs)
+                print(f'[!] Captured exception, snapshot is saved to {path}.', file=sys.stderr)
+            except Exception:
+                print(f'[!] Failed to save snapshot:\n{traceback.format_exc()}', file=sys.stderr)
+        elif enabled and not headless:
+            from tuls.debug.trace import trace, print_with_split, print_system_log
+
             print_system_log('Captured exception, extract stack and start trace.')
             print_with_split(traceback.format_exc()[:-1])
             exc_type, exc_value, exc_traceback = sys.exc_info()
             trace(exc_traceback.tb_next)
         raise e
-
+    finally:
+        if watcher is not None:
+            watcher.stop()
@@ -0,0 +1,187 @@
+import gc
+import sys
+import time
+import types
+
+from tuls.debug.stack_logger import get_variables_from_frame
+
+# objects that are shared program structure rather than data owned by a variable, they are never traversed
+_OPAQUE_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.CodeType,
+    types.FrameType,
+    types.TracebackType
+)
+_TENSOR, _ARRAY, _OPAQUE, _OBJECT = range(4)
+
+
+def _kind(value_type):
+    for base in value_type.__mro__:
+        name = f'{base.__module__}.{base.__qualname__}'
+        if name == 'torch.Tensor':
+            return _TENSOR
+        elif name == 'numpy.ndarray':
+            return _ARRAY
+    return _OPAQUE if issubclass(value_type, _OPAQUE_TYPES) else _OBJECT
+
+
+class MemoryInspector:
+    def __init__(self, max_objects=1000000, time_budget=2.0):
+        self.max_objects = max_objects
+        self.time_budget = time_budget
+        self.kinds = dict()
+        self.reset()
+
+    def reset(self):
+        # ids of visited objects and storages, the objects themselves are kept so their ids cannot be reused
+        self.seen = set()
+        self.alive = []
+        self.num_objects = 0
+        self.deadline = None
+        self._visit(id(self), self)
+
+    def _exhausted(self):
+        if self.num_objects >= self.max_objects:
+            return True
+        # the clock is read only every thousand objects to keep the walk cheap
+        return self.num_objects % 1000 == 0 and self.deadline is not None and time.perf_counter() > self.deadline
+
+    def _visit(self, key, value):
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.alive.append(value)
+        return True
+
+    def _tensor_bytes(self, tensor, sizes):
+        if tensor.is_meta:
+            return
+        try:
+            storage = tensor.untyped_storage()
+            data_ptr, num_bytes = storage.data_ptr(), storage.nbytes()
+        except (RuntimeError, NotImplementedError):
+            # sparse and other storage-less layouts are charged by their logical size
+            data_ptr, num_bytes = None, tensor.numel()*tensor.element_size()
+        if tensor.device.type == 'cpu':
+            # host tensors and ndarrays share one key space, so memory aliased through numpy is charged once
+            key, size_key = ('cpu', data_ptr), 'cpu_bytes'
+        else:
+            key, size_key = (str(tensor.device), data_ptr), 'device_bytes'
+        if data_ptr is None:
+            key = ('tensor', id(tensor))
+        if self._visit(key, tensor):
+            sizes[size_key] += num_bytes
+
+    def _array_bytes(self, array, sizes):
+        import numpy as np
+
+        root = array
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        if root.base is not None and _kind(type(root.base)) == _TENSOR:
+            # arrays of Tensor.numpy() may start past the storage of the tensor, so they are keyed by that storage
+            self._tensor_bytes(root.base, sizes)
+            return
+        if root.base is not None:
+            try:
+                # arrays over a foreign buffer are keyed by its start, wherever their own data begins
+                root = np.frombuffer(root.base, dtype=np.uint8)
+            except (TypeError, ValueError):
+                pass
+        if self._visit(('cpu', root.__array_interface__['data'][0]), root):
+            sizes['cpu_bytes'] += root.nbytes
+
+    def measure(self, value):
+        sizes = dict(cpu_bytes=0, device_bytes=0, num_objects=0, truncated=False)
+        stack = [value]
+        while stack:
+            if self._exhausted():
+                sizes['truncated'] = True
+                break
+            obj = stack.pop()
+            if not self._visit(id(obj), obj):
+                continue
+            self.num_objects += 1
+            sizes['num_objects'] += 1
+            value_type = type(obj)
+            kind = self.kinds.get(value_type)
+            if kind is None:
+                kind = self.kinds[value_type] = _kind(value_type)
+            if kind == _OPAQUE:
+                continue
+            if kind == _OBJECT:
+                sizes['cpu_bytes'] += sys.getsizeof(obj, 0)
+                stack.extend(gc.get_referents(obj))
+                continue
+            # the data of tensors and arrays is charged per buffer below, so only their headers are counted here
+            sizes['cpu_bytes'] += object.__sizeof__(obj)
+            if kind == _TENSOR:
+                self._tensor_bytes(obj, sizes)
+                if obj.grad is not None:
+                    stack.append(obj.grad)
+            elif kind == _ARRAY:
+                self._array_bytes(obj, sizes)
+                if obj.dtype.hasobject:
+                    stack.extend(obj.ravel().tolist())
+        return sizes
+
+    def _rows(self, variables, frame_label):
+        # only the rows of the tracer need beacon, measuring values works without it
+        from beacon.adict import ADict
+
+        rows = []
+        for name, value in variables.items():
+            sizes = self.measure(value)
+            rows.append(ADict(
+                frame=frame_label,
+                name=name,
+                type=value.__class__.__name__,
+                total_bytes=sizes['cpu_bytes']+sizes['device_bytes'],
+                **sizes
+            ))
+        return rows
+
+    def inspect_frame(self, frame, include_globals=False, frame_label=None):
+        self.reset()
+        self.deadline = time.perf_counter()+self.time_budget
+        return self._inspect_frame(frame, include_globals, frame_label)
+
+    def _inspect_frame(self, frame, include_globals=False, frame_label=None):
+        variables = get_variables_from_frame(frame)
+        code = (frame.tb_frame if hasattr(frame, 'tb_frame') else frame).f_code
+        frame_label = frame_label or f'{code.co_name} ({code.co_filename})'
+        rows = self._rows(variables['locals'], frame_label)
+        if include_globals:
+            rows += self._rows(variables['globals'], f'{frame_label} globals')
+        return sorted(rows, key=lambda row: row.total_bytes, reverse=True)
+
+    def inspect_stack(self, logger, include_globals=False):
+        self.reset()
+        self.deadline = time.perf_counter()+self.time_budget
+        rows = []
+        # innermost frames come first, so objects shared along the stack are charged where they are used last
+        for index in reversed(range(len(logger))):
+            rows += self._inspect_frame(logger[index], include_globals=include_globals)
+        return sorted(rows, key=lambda row: row.total_bytes, reverse=True)
+
+    @staticmethod
+    def table(rows, top=20):
+        rows = rows[:top]
+        name_width = max([len(row.name) for row in rows]+[8])
+        frame_width = min(max([len(row.frame) for row in rows]+[5]), 60)
+        lines = [
+            f'{"Variable":<{name_width}} | {"Type":<16} | {"CPU(MB)":>10} | {"Device(MB)":>10} | '
+            f'{"Objects":>9} | Frame'
+        ]
+        lines.append('-'*(len(lines[0])+frame_width-5))
+        for row in rows:
+            lines.append(
+                f'{row.name:<{name_width}} | {row.type[:16]:<16} | {row.cpu_bytes/2**20:>10.3f} | '
+                f'{row.device_bytes/2**20:>10.3f} | {row.num_objects:>9d}{"+" if row.truncated else " "}| '
+                f'{row.frame[-frame_width:]}'
+            )
+        return '\n'.join(lines)
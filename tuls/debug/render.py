@@ -0,0 +1,233 @@
+import inspect
+import itertools
+import threading
+from collections.abc import Mapping, Sequence
+
+DEFAULT_MAX_CHARS = 2000
+DEFAULT_MAX_ITEMS = 20
+DEFAULT_TIME_BUDGET = 0.5
+DEFAULT_PAGE_SIZE = 50
+# tensors and arrays above this size are described without reducing over their values
+STATS_MAX_NUMEL = 1 << 24
+
+# qualified type name -> function(value, max_items, depth) returning a summary string
+RENDERERS = dict()
+
+
+def register_renderer(*type_names):
+    def decorator(renderer):
+        for type_name in type_names:
+            RENDERERS[type_name] = renderer
+        return renderer
+    return decorator
+
+
+def _qualified_name(value_type):
+    return f'{value_type.__module__}.{value_type.__qualname__}'
+
+
+def get_renderer(value):
+    # lookup by name keeps torch, numpy and pandas unimported until such a value actually shows up
+    for value_type in type(value).__mro__:
+        renderer = RENDERERS.get(_qualified_name(value_type))
+        if renderer is not None:
+            return renderer
+
+
+def truncate(text, max_chars=DEFAULT_MAX_CHARS):
+    if len(text) <= max_chars:
+        return text
+    return f'{text[:max_chars]}... ({len(text)-max_chars} more characters)'
+
+
+def bounded_repr(value, max_chars=DEFAULT_MAX_CHARS, time_budget=DEFAULT_TIME_BUDGET):
+    # a slow __repr__ keeps running on its daemon thread, but the debugger stops waiting for it. the budget is
+    # best effort: a thread that times out is never stopped and keeps consuming CPU until repr returns, and a
+    # repr running in C code that holds the GIL blocks the debugger as well until it releases the GIL
+    result = []
+
+    def run():
+        try:
+            result.append(repr(value))
+        except Exception as error:
+            result.append(f'<repr failed: {error.__class__.__name__}: {error}>')
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(time_budget)
+    if not result:
+        return f'<{value.__class__.__name__} repr exceeded {time_budget}s>'
+    return truncate(result[0], max_chars)
+
+
+def render_value(
+    value,
+    max_items=DEFAULT_MAX_ITEMS,
+    depth=2,
+    max_chars=DEFAULT_MAX_CHARS,
+    time_budget=DEFAULT_TIME_BUDGET
+):
+    if value is None or isinstance(value, (bool, float, complex)):
+        return repr(value)
+    elif isinstance(value, int):
+        try:
+            return truncate(repr(value), max_chars)
+        except ValueError:
+            return f'int({value.bit_length()} bits)'
+    renderer = get_renderer(value)
+    if renderer is None:
+        return bounded_repr(value, max_chars=max_chars, time_budget=time_budget)
+    try:
+        return truncate(renderer(value, max_items, depth), max_chars)
+    except Exception as error:
+        return f'<{value.__class__.__name__} render failed: {error.__class__.__name__}: {error}>'
+
+
+def _render_item(value, max_items, depth):
+    return render_value(value, max_items=max_items, depth=depth-1, max_chars=200)
+
+
+def _more(length, max_items):
+    return [f'... {length-max_items} more'] if length > max_items else []
+
+
+@register_renderer('builtins.str', 'builtins.bytes', 'builtins.bytearray')
+def render_text(value, max_items, depth):
+    preview_length = DEFAULT_MAX_CHARS//2
+    if len(value) <= preview_length:
+        return repr(value)
+    return f'{repr(value[:preview_length])}... ({len(value)} {"characters" if isinstance(value, str) else "bytes"})'
+
+
+@register_renderer('builtins.list', 'builtins.tuple', 'builtins.set', 'builtins.frozenset', 'collections.deque')
+def render_collection(value, max_items, depth):
+    name = value.__class__.__name__
+    if depth <= 0:
+        return f'{name}({len(value)} items)'
+    items = [_render_item(item, max_items, depth) for item in itertools.islice(value, max_items)]
+    return f'{name}({len(value)} items) [{", ".join(items+_more(len(value), max_items))}]'
+
+
+@register_renderer('builtins.dict', 'types.MappingProxyType')
+def render_mapping(value, max_items, depth):
+    name = value.__class__.__name__
+    if depth <= 0:
+        return f'{name}({len(value)} items)'
+    items = [
+        f'{_render_item(key, max_items, 1)}: {_render_item(item, max_items, depth)}'
+        for key, item in itertools.islice(value.items(), max_items)
+    ]
+    return f'{name}({len(value)} items) {{{", ".join(items+_more(len(value), max_items))}}}'
+
+
+@register_renderer('torch.Tensor')
+def render_tensor(value, max_items, depth):
+    import torch
+
+    header = f'{value.__class__.__name__}(shape={tuple(value.shape)}, dtype={value.dtype}, device={value.device}'
+    if value.requires_grad:
+        header += ', requires_grad=True'
+    if value.is_meta or value.layout != torch.strided or value.numel() == 0 or value.numel() > STATS_MAX_NUMEL:
+        return f'{header})'
+    values = value.detach()
+    if not values.is_complex() and values.dtype != torch.bool:
+        # a single stacked host copy syncs the device once for all statistics
+        floats = values.float()
+        std = floats.std() if floats.numel() > 1 else floats.new_zeros(())
+        stats = torch.stack([floats.min(), floats.max(), floats.mean(), std])
+        header += ', min={:.4g}, max={:.4g}, mean={:.4g}, std={:.4g}'.format(*stats.tolist())
+    preview = values.flatten()[:max_items].tolist()
+    return f'{header})\n{preview}{" ..." if value.numel() > max_items else ""}'
+
+
+@register_renderer('numpy.ndarray')
+def render_ndarray(value, max_items, depth):
+    header = f'ndarray(shape={value.shape}, dtype={value.dtype}'
+    if value.size == 0 or value.size > STATS_MAX_NUMEL:
+        return f'{header})'
+    if value.dtype.kind in 'iuf':
+        header += f', min={value.min():.4g}, max={value.max():.4g}, mean={value.mean():.4g}, std={value.std():.4g}'
+    preview = value.reshape(-1)[:max_items].tolist()
+    return f'{header})\n{preview}{" ..." if value.size > max_items else ""}'
+
+
+@register_renderer('pandas.core.frame.DataFrame')
+def render_data_frame(value, max_items, depth):
+    columns = [str(column) for column in value.columns[:max_items]]+_more(len(value.columns), max_items)
+    header = f'DataFrame(shape={value.shape}, columns=[{", ".join(columns)}])'
+    return f'{header}\n{value.head(min(max_items, 10)).to_string(max_cols=max_items, max_colwidth=40)}'
+
+
+@register_renderer('pandas.core.series.Series')
+def render_series(value, max_items, depth):
+    header = f'Series(name={value.name}, length={len(value)}, dtype={value.dtype})'
+    return f'{header}\n{value.head(max_items).to_string(max_rows=max_items)}'
+
+
+def _page_slice(value, start, end):
+    if isinstance(value, Mapping):
+        return [
+            f'{render_value(key, depth=0, max_chars=200)}: {render_value(item, depth=1, max_chars=200)}'
+            for key, item in itertools.islice(value.items(), start, end)
+        ]
+    elif isinstance(value, Sequence) or get_renderer(value) in (render_tensor, render_ndarray):
+        items = value[start:end]
+    else:
+        items = itertools.islice(value, start, end)
+    return [
+        f'[{index}] {render_value(item, depth=1, max_chars=200)}'
+        for index, item in zip(itertools.count(start), items)
+    ]
+
+
+def page_items(value, page, page_size=DEFAULT_PAGE_SIZE):
+    if not hasattr(value, '__len__') or not hasattr(value, '__iter__'):
+        raise TypeError(f'value should be a sized collection, but {value.__class__.__name__} is not.')
+    num_pages = max(1, -(-len(value)//page_size))
+    page = min(max(page, 0), num_pages-1)
+    return _page_slice(value, page*page_size, (page+1)*page_size), page, num_pages
+
+
+class LazyAttribute:
+    def __init__(self, owner, name, kind):
+        self.owner = owner
+        self.name = name
+        self.kind = kind
+        self.evaluated = False
+        self.value = None
+
+    def evaluate(self):
+        if not self.evaluated:
+            try:
+                self.value = getattr(self.owner, self.name)
+            except Exception as error:
+                self.value = error
+            self.evaluated = True
+        return self.value
+
+    def render(self):
+        return render_value(self.evaluate(), depth=1)
+
+    def __repr__(self):
+        return self.render() if self.evaluated else f'<{self.kind}, not evaluated>'
+
+
+def inspect_members(variable):
+    # members are classified statically, so properties and other descriptors run only when asked for
+    attributes, methods = dict(), dict()
+    for name in dir(variable):
+        if not isinstance(name, str) or name.startswith('__'):
+            continue
+        try:
+            static_value = inspect.getattr_static(variable, name)
+        except AttributeError:
+            continue
+        if inspect.isroutine(static_value) or isinstance(static_value, (classmethod, staticmethod)):
+            methods[name] = static_value
+        elif inspect.ismemberdescriptor(static_value):
+            attributes[name] = LazyAttribute(variable, name, 'slot')
+        elif hasattr(type(static_value), '__get__'):
+            attributes[name] = LazyAttribute(variable, name, type(static_value).__name__)
+        else:
+            attributes[name] = static_value
+    return attributes, methods
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import time
+
+from beacon.adict import ADict
+
+
+def _code_label(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.01, max_depth=128, thread_ids=None):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_ids = thread_ids
+        # code object -> small integer, stacks are counted as tuples of these integers from root to leaf
+        self.code_ids = dict()
+        self.codes = []
+        self.counts = dict()
+        self.num_samples = 0
+        self.elapsed = 0.0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _key(self, frame):
+        code_ids = self.code_ids
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            code_id = code_ids.get(code)
+            if code_id is None:
+                code_id = code_ids[code] = len(self.codes)
+                self.codes.append(code)
+            stack.append(code_id)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def sample(self):
+        own_id = threading.get_ident()
+        counts = self.counts
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            key = self._key(frame)
+            counts[key] = counts.get(key, 0)+1
+        self.num_samples += 1
+
+    def _run(self):
+        start = next_time = time.perf_counter()
+        # sampling on a fixed schedule keeps the rate steady even when a sample itself takes a while
+        while not self._stopped.wait(max(next_time-time.perf_counter(), 0)):
+            self.sample()
+            next_time += self.interval
+        self.elapsed += time.perf_counter()-start
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError('SamplingProfiler is already running.')
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def reset(self):
+        self.counts.clear()
+        self.num_samples = 0
+        self.elapsed = 0.0
+
+    def _snapshot(self):
+        # counts are copied before codes, so every id in the copied stacks already has its code while sampling runs
+        counts = list(self.counts.items())
+        return counts, list(self.codes)
+
+    def collapsed(self):
+        counts, codes = self._snapshot()
+        labels = [_code_label(code) for code in codes]
+        return '\n'.join(
+            f'{";".join(labels[code_id] for code_id in stack)} {count}'
+            for stack, count in sorted(counts, key=lambda item: item[1], reverse=True)
+        )
+
+    def export_collapsed(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+            f.write('\n')
+
+    def summary(self, sort_by='self_samples'):
+        counts, codes = self._snapshot()
+        self_samples = [0]*len(codes)
+        total_samples = [0]*len(codes)
+        for stack, count in counts:
+            self_samples[stack[-1]] += count
+            # recursive functions are charged once per stack for the inclusive count
+            for code_id in set(stack):
+                total_samples[code_id] += count
+        num_stacks = max(sum(count for _, count in counts), 1)
+        rows = [
+            ADict(
+                name=_code_label(code),
+                self_samples=self_samples[code_id],
+                total_samples=total_samples[code_id],
+                self_ratio=self_samples[code_id]/num_stacks,
+                total_ratio=total_samples[code_id]/num_stacks
+            )
+            for code_id, code in enumerate(codes)
+        ]
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows
+
+    def table(self, sort_by='self_samples', top=20):
+        rows = self.summary(sort_by)[:top]
+        name_width = max([len(row.name) for row in rows]+[8])
+        lines = [f'{"Function":<{name_width}} | {"Self":>8} | {"Self(%)":>8} | {"Total":>8} | {"Total(%)":>8}']
+        lines.append('-'*len(lines[0]))
+        for row in rows:
+            lines.append(
+                f'{row.name:<{name_width}} | {row.self_samples:>8d} | {row.self_ratio*100:>8.2f} | '
+                f'{row.total_samples:>8d} | {row.total_ratio*100:>8.2f}'
+            )
+        return '\n'.join(lines)
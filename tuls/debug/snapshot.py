@@ -0,0 +1,161 @@
+import gzip
+import json
+import linecache
+import os
+import time
+import traceback
+from types import ModuleType, SimpleNamespace
+
+from tuls.debug.render import register_renderer, render_value
+from tuls.debug.stack_logger import StackLogger
+from tuls.misc.io import fast_write
+
+SNAPSHOT_VERSION = 1
+DEFAULT_BYTE_BUDGET = 1 << 20
+DEFAULT_TIME_BUDGET = 2.0
+DEFAULT_CONTEXT_LINES = 10
+DEFAULT_MAX_FRAMES = 100
+DEFAULT_MAX_VALUE_CHARS = 1000
+
+
+def _source_context(filename, lineno, context_lines, budget, deadline):
+    lines = linecache.getlines(filename)
+    start = max(lineno-context_lines, 1)
+    # source lines share the byte budget with the locals, a minified or generated line is cut like any value
+    source = []
+    for line in lines[start-1:lineno+context_lines]:
+        if budget[0] <= 0 or time.perf_counter() > deadline:
+            break
+        line = line.rstrip('\n')[:min(DEFAULT_MAX_VALUE_CHARS, budget[0])]
+        budget[0] -= len(line)+1
+        source.append(line)
+    return source, start
+
+
+def _summarize_locals(local_vars, budget, deadline):
+    # every value is rendered under what is left of the byte budget, and nothing is rendered past the deadline
+    summaries, omitted = dict(), 0
+    for name, value in local_vars.items():
+        if isinstance(value, ModuleType) or name.startswith('__'):
+            continue
+        remaining = deadline-time.perf_counter()
+        if budget[0] <= len(name) or remaining <= 0:
+            omitted += 1
+            continue
+        text = render_value(
+            value,
+            max_items=10,
+            depth=1,
+            max_chars=min(DEFAULT_MAX_VALUE_CHARS, budget[0]-len(name)),
+            time_budget=min(0.1, remaining)
+        )
+        budget[0] -= len(name)+len(text)
+        summaries[name] = dict(type=value.__class__.__name__, value=text)
+    return summaries, omitted
+
+
+def build_snapshot(
+    exc_value,
+    byte_budget=DEFAULT_BYTE_BUDGET,
+    time_budget=DEFAULT_TIME_BUDGET,
+    context_lines=DEFAULT_CONTEXT_LINES,
+    max_frames=DEFAULT_MAX_FRAMES,
+    skip_frames=0
+):
+    deadline = time.perf_counter()+time_budget
+    exception = traceback.format_exception(type(exc_value), exc_value, exc_value.__traceback__)
+    exception = ''.join(exception)[-byte_budget//4:]
+    budget = [byte_budget-len(exception)]
+    entries = []
+    tb = exc_value.__traceback__
+    while tb is not None:
+        entries.append((tb.tb_frame, tb.tb_lineno))
+        tb = tb.tb_next
+    entries = entries[skip_frames:]
+    # the innermost frames are where the failure happened, they are kept and summarized first
+    entries = entries[-max_frames:]
+    frames = []
+    for frame, lineno in reversed(entries):
+        code = frame.f_code
+        source, source_start = _source_context(code.co_filename, lineno, context_lines, budget, deadline)
+        local_vars, omitted = _summarize_locals(frame.f_locals, budget, deadline)
+        frames.append(dict(
+            filename=code.co_filename,
+            function=code.co_name,
+            lineno=lineno,
+            source=source,
+            source_start=source_start,
+            locals=local_vars,
+            omitted=omitted
+        ))
+    frames.reverse()
+    return dict(
+        version=SNAPSHOT_VERSION,
+        time=time.time(),
+        pid=os.getpid(),
+        exception_type=exc_value.__class__.__name__,
+        exception=exception,
+        frames=frames
+    )
+
+
+def save_snapshot(exc_value, path, **kwargs):
+    snapshot = build_snapshot(exc_value, **kwargs)
+    compression = 'gzip' if path.endswith('.gz') else None
+    with fast_write(path, atomic=True, compression=compression, compression_level=1) as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    return path
+
+
+def default_snapshot_path(directory='.'):
+    return os.path.join(directory, f'snapshot_{time.strftime("%Y%m%d_%H%M%S")}_{os.getpid()}.json.gz')
+
+
+def load_snapshot(path):
+    with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path)) as f:
+        snapshot = json.load(f)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'version should be {SNAPSHOT_VERSION}, but {snapshot.get("version")} is not.')
+    return snapshot
+
+
+class SnapshotValue:
+    def __init__(self, type_name, text):
+        self.type_name = type_name
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
+@register_renderer('tuls.debug.snapshot.SnapshotValue')
+def render_snapshot_value(value, max_items, depth):
+    return f'{value.type_name} | {value.text}'
+
+
+class SnapshotFrame:
+    def __init__(self, frame):
+        # mimics the frame attributes the tracer reads, with summarized values in place of live objects
+        self.f_code = SimpleNamespace(co_filename=frame['filename'], co_name=frame['function'])
+        self.f_lineno = frame['lineno']
+        self.f_globals = dict()
+        self.f_locals = {
+            name: SnapshotValue(value['type'], value['value']) for name, value in frame['locals'].items()
+        }
+        self.snapshot_source = (frame['source'], frame['source_start'])
+
+
+class SnapshotLogger(StackLogger):
+    def __init__(self, snapshot):
+        super().__init__()
+        self.snapshot = snapshot
+        self.frames = [SnapshotFrame(frame) for frame in snapshot['frames']]
+
+
+def open_snapshot(path):
+    from tuls.debug.trace import print_system_log, print_with_split, trace
+
+    snapshot = load_snapshot(path)
+    print_system_log(f'Loaded snapshot of process {snapshot["pid"]}, {len(snapshot["frames"])} frames.')
+    print_with_split(snapshot['exception'].rstrip('\n'))
+    trace(logger=SnapshotLogger(snapshot))
@@ -1,4 +1,5 @@
 import inspect
+from types import ModuleType
 
 
 class StackLogger:
@@ -62,3 +63,20 @@ class StackLogger:
         else:
             raise IndexError(f'index should be 0 <= index <= {len(self.frames)-1}, but {index} is not.')
         return self.current_frame()
+
+
+def get_variables_from_frame(frame, include_all=False):
+    if inspect.istraceback(frame):
+        frame = frame.tb_frame
+    global_vars = {
+        name: value for name, value in frame.f_globals.items()
+        if include_all or (not isinstance(value, ModuleType) and not name.startswith('__'))
+    }
+    local_vars = {
+        name: value for name, value in frame.f_locals.items()
+        if include_all or (not isinstance(value, ModuleType) and not name.startswith('__'))
+    }
+    variables = dict()
+    variables['globals'] = global_vars
+    variables['locals'] = local_vars
+    return variables
@@ -2,25 +2,17 @@ import os
 import sys
 import traceback
 import inspect
-from types import ModuleType
-from typing import Iterable
 
 from InquirerPy import inquirer
 from InquirerPy.base import Choice
 from InquirerPy.utils import color_print
 from beacon.adict import ADict
 
+from tuls.debug.cache import SourceCache
+from tuls.debug.memory import MemoryInspector
+from tuls.debug.render import LazyAttribute, inspect_members, page_items, render_value
 from tuls.debug.viewer import open_viewer
-from tuls.debug.stack_logger import StackLogger
-
-
-def replace_iterable_repr(value):
-    if isinstance(value, Iterable):
-        if hasattr(value, '__len__'):
-            return f'{value.__class__.__name__}({len(value)} items)'
-        else:
-            return f'{value.__class__.__name__}'
-    return value
+from tuls.debug.stack_logger import StackLogger, get_variables_from_frame
 
 
 class TraceStatus:
@@ -81,6 +73,14 @@ class KeyBindingRegistry:
         NEXT_LINE=ADict(
             key='down',
             help='Load next line from history.'
+        ),
+        ITEMS=ADict(
+            key='alt-i',
+            help='Page through items of selected variable if it is a collection.'
+        ),
+        MEMORY=ADict(
+            key='c-o',
+            help='Rank variables by memory footprint in current frame, or across all frames in frame menu.'
         )
     )
 
@@ -142,23 +142,6 @@ def show_main_menu():
     return main_menu.execute()
 
 
-def get_variables_from_frame(frame, include_all=False):
-    if inspect.istraceback(frame):
-        frame = frame.tb_frame
-    global_vars = {
-        name: value for name, value in frame.f_globals.items()
-        if include_all or (not isinstance(value, ModuleType) and not name.startswith('__'))
-    }
-    local_vars = {
-        name: value for name, value in frame.f_locals.items()
-        if include_all or (not isinstance(value, ModuleType) and not name.startswith('__'))
-    }
-    variables = dict()
-    variables['globals'] = global_vars
-    variables['locals'] = local_vars
-    return variables
-
-
 def _get_variable_choices(variables, verbosity):
     choices = dict()
     if verbosity == 3:
@@ -168,19 +151,49 @@ def _get_variable_choices(variables, verbosity):
 
 
 def get_variable_info(variable):
-    class_members = {
-        name: getattr(variable, name) for name in dir(variable)
-        if isinstance(name, str) and hasattr(variable, name) and not name.startswith('__')
-    }
-    attributes = {
-        name: replace_iterable_repr(value)
-        for name, value in class_members.items()
-        if not inspect.ismethod(value)
-    }
-    methods = {name: value for name, value in class_members.items() if inspect.ismethod(value)}
+    attributes, methods = inspect_members(variable)
     return ADict(**attributes), ADict(**methods)
 
 
+def show_attributes(var_name, attributes):
+    lines = []
+    for name, value in attributes.items():
+        rendered = repr(value) if isinstance(value, LazyAttribute) else render_value(value, depth=1, max_chars=200)
+        lines.append(f'{name}: {rendered}')
+    print_with_split(lines)
+    lazy_names = [name for name, value in attributes.items() if isinstance(value, LazyAttribute)]
+    while lazy_names:
+        attr_selection = inquirer.fuzzy(
+            message=f'Select attributes of "{var_name}" to evaluate(Press Shift+↑ to return.):',
+            choices=lazy_names
+        )
+        KeyBindingRegistry.register_kb_from_event_codes(executor=attr_selection, event_codes=('ESCAPE',))
+        choice = attr_selection.execute()
+        if choice not in lazy_names:
+            break
+        print_with_split(f'{var_name}.{choice} | {attributes[choice].render()}')
+
+
+def show_items(var_name, variable):
+    page = 0
+    while True:
+        lines, page, num_pages = page_items(variable, page)
+        print_with_split([f'{var_name} | Page {page+1}/{num_pages}']+lines)
+        if num_pages == 1:
+            break
+        move = inquirer.select(
+            message='Select a page to show:',
+            choices=[
+                Choice(name='Next Page', value=1),
+                Choice(name='Previous Page', value=-1),
+                Choice(name='Return', value=0)
+            ]
+        ).execute()
+        if move == 0:
+            break
+        page += move
+
+
 def print_with_split(lines, highlights=None, is_system_log=False):
     print('-'*50)
     if isinstance(lines, str):
@@ -199,31 +212,31 @@ def print_with_split(lines, highlights=None, is_system_log=False):
     print('-'*50)
 
 
-def print_source(obj, highlights=None, query=None):
-    lines = inspect.getsource(obj)[:-1].split('\n')
-    highlights = highlights or dict()
-    for index, line in enumerate(lines):
-        if query is not None and query in line:
-            sub_lines = line.split(query)
-            highlights[index] = []
-            for sub_index, sub_line in enumerate(sub_lines):
-                if sub_index != 0:
-                    highlights[index].append(('#71ADFF', query))
-                highlights[index].append(('', sub_line))
+def print_source(obj, highlights=None, query=None, cache=None):
+    cache = cache or SourceCache()
+    lines, _ = cache.source_lines(obj)
+    highlights = dict(highlights or dict())
+    if query is not None:
+        highlights.update(cache.search(obj, query))
     print_with_split(lines, highlights)
 
 
+def print_frame_source(frame, cache):
+    _, start = cache.source_lines(frame)
+    print_source(frame, {cache.frame_info(frame).lineno-start: '#4DEA77'}, cache=cache)
+
+
 def print_system_log(text):
     color_print([('#FAD866', f'[!] {text}')])
 
 
-def search_and_show_frames(logger, verbosity):
-    frames_info = [inspect.getframeinfo(frame) for frame in logger]
+def search_and_show_frames(logger, verbosity, cache=None):
+    cache = cache or SourceCache()
     while True:
+        # labels come from code objects memoized in the session cache, no source file is touched here
         choices = ADict(**{
-            f'[>] {frame_info.filename} | Line {frame_info.lineno}'
-            if index == logger.index else f'{frame_info.filename} | Line {frame_info.lineno}': index
-            for index, frame_info in enumerate(frames_info)
+            f'[>] {cache.frame_label(frame)}' if index == logger.index else cache.frame_label(frame): index
+            for index, frame in enumerate(logger)
         })
         frame_names = list(choices.keys())
         frame_selection = inquirer.fuzzy(
@@ -236,6 +249,7 @@ def search_and_show_frames(logger, verbosity):
             'SOURCE',
             'SEARCH',
             'INSPECT',
+            'MEMORY',
             'EXEC',
             'OPEN_EDITOR',
             'TRACE_FORWARD',
@@ -248,29 +262,33 @@ def search_and_show_frames(logger, verbosity):
         elif choice == 'HELP':
             print_with_split(KeyBindingRegistry.get_help(event_codes), is_system_log=True)
         elif choice == 'SOURCE':
-            frame = logger.current_frame()
-            frame_info = inspect.getframeinfo(frame)
-            print_source(frame, {frame_info.lineno: '#4DEA77'})
+            print_frame_source(logger.current_frame(), cache)
         elif choice == 'SEARCH':
             frame = logger.current_frame()
-            print_source(frame, query=inquirer.text('Press query to search:').execute())
+            print_source(frame, query=inquirer.text('Press query to search:').execute(), cache=cache)
+        elif choice == 'MEMORY':
+            inspector = MemoryInspector()
+            print_with_split(inspector.table(inspector.inspect_stack(logger, include_globals=verbosity == 3)))
         elif choice == 'INSPECT':
-            search_and_show_variables(logger, verbosity)
+            search_and_show_variables(logger, verbosity, cache)
         elif choice == 'EXEC':
             frame = logger.current_frame()
             online_execute(frame)
         elif choice == 'OPEN_EDITOR':
             frame = logger.current_frame()
-            frame_info = inspect.getframeinfo(frame)
+            frame_info = cache.frame_info(frame)
             file_path = os.path.abspath(frame.f_code.co_filename)
-            open_viewer(file_path=file_path, start_line=frame_info.lineno)
+            if os.path.isfile(file_path):
+                open_viewer(file_path=file_path, start_line=frame_info.lineno, cache=cache)
+            else:
+                print_system_log(f'There does not exist source file "{file_path}".')
         elif choice == 'TRACE_FORWARD':
             next_frame = logger.trace()
             if next_frame is None:
                 print_system_log('There does not exist next frame, maybe you are already in main code.')
             else:
                 frame = next_frame
-                frame_info = inspect.getframeinfo(frame)
+                frame_info = cache.frame_info(frame)
                 print_system_log(f'Jumped to: {frame_info.filename} | Line {frame_info.lineno}')
         elif choice == 'TRACE_BACKWARD':
             prev_frame = logger.traceback()
@@ -278,13 +296,13 @@ def search_and_show_frames(logger, verbosity):
                 print('There does not exist previous frame, maybe you are already in last stack.')
             else:
                 frame = prev_frame
-                frame_info = inspect.getframeinfo(frame)
+                frame_info = cache.frame_info(frame)
                 print_system_log(f'Jumped to: {frame_info.filename} | Line {frame_info.lineno}')
         else:
             if choice in choices:
                 frame_index = choices[choice]
                 frame = logger.set_frame_by_index(frame_index)
-                frame_info = inspect.getframeinfo(frame)
+                frame_info = cache.frame_info(frame)
                 print_system_log(f'Jumped to: {frame_info.filename} | Line {frame_info.lineno}')
             else:
                 print_system_log(
@@ -292,9 +310,10 @@ def search_and_show_frames(logger, verbosity):
                 )
 
 
-def search_and_show_variables(logger, verbosity):
+def search_and_show_variables(logger, verbosity, cache=None):
+    cache = cache or SourceCache()
     frame = logger.current_frame()
-    frame_info = inspect.getframeinfo(frame)
+    frame_info = cache.frame_info(frame)
     print_system_log(f'Currently on: {frame_info.filename} | Line {frame_info.lineno}')
     frame_vars = get_variables_from_frame(frame)
     choices = _get_variable_choices(frame_vars, verbosity)
@@ -316,6 +335,8 @@ def search_and_show_variables(logger, verbosity):
             'OPEN_EDITOR',
             'ATTRIBUTES',
             'METHODS',
+            'ITEMS',
+            'MEMORY',
             'TRACE_FORWARD',
             'TRACE_BACKWARD'
         )
@@ -336,7 +357,7 @@ def search_and_show_variables(logger, verbosity):
                     inspect.isframe(selected_var)
                 ]
             ):
-                print_source(selected_var)
+                print_source(selected_var, cache=cache)
             else:
                 print_system_log(f'There does not exist source code of variable "{var_name}".')
         elif choice == 'SEARCH':
@@ -350,7 +371,7 @@ def search_and_show_variables(logger, verbosity):
                     inspect.isframe(selected_var)
                 ]
             ):
-                print_source(selected_var, query=inquirer.text('Press query to search:').execute())
+                print_source(selected_var, query=inquirer.text('Press query to search:').execute(), cache=cache)
             else:
                 print_system_log(f'There does not exist source code of variable "{var_name}".')
         elif choice == 'EXEC':
@@ -359,26 +380,38 @@ def search_and_show_variables(logger, verbosity):
         elif choice == 'OPEN_EDITOR':
             frame = logger.current_frame()
             file_path = os.path.abspath(frame.f_code.co_filename)
-            open_viewer(file_path)
+            if os.path.isfile(file_path):
+                open_viewer(file_path, cache=cache)
+            else:
+                print_system_log(f'There does not exist source file "{file_path}".')
         elif choice == 'ATTRIBUTES':
             if attributes:
-                print(attributes.to_xyz())
+                show_attributes(var_name, attributes)
             else:
                 print_system_log(f'There does not exist any attribute in variable "{var_name}".')
         elif choice == 'METHODS':
             if methods:
-                print(methods.to_xyz())
+                print_with_split(list(methods.keys()))
             else:
                 print_system_log(f'There does not exist any method in variable "{var_name}".')
+        elif choice == 'MEMORY':
+            inspector = MemoryInspector()
+            frame = logger.current_frame()
+            print_with_split(inspector.table(inspector.inspect_frame(frame, include_globals=verbosity == 3)))
+        elif choice == 'ITEMS':
+            if hasattr(selected_var, '__len__') and hasattr(selected_var, '__iter__'):
+                show_items(var_name, selected_var)
+            else:
+                print_system_log(f'Variable "{var_name}" is not a collection.')
         elif choice == 'TRACE_FORWARD':
             next_frame = logger.trace()
             if next_frame is None:
                 print_system_log('There does not exist next frame, maybe you are already in main code.')
             else:
                 frame = next_frame
-                frame_info = inspect.getframeinfo(frame)
+                frame_info = cache.frame_info(frame)
                 print_system_log(f'{frame_info.filename} | Line {frame_info.lineno}')
-                selected_var = None
+                selected_var = attributes = methods = None
                 frame_vars = get_variables_from_frame(frame)
                 choices = _get_variable_choices(frame_vars, verbosity)
         elif choice == 'TRACE_BACKWARD':
@@ -387,9 +420,9 @@ def search_and_show_variables(logger, verbosity):
                 print('There does not exist previous frame, maybe you are already in last stack.')
             else:
                 frame = prev_frame
-                frame_info = inspect.getframeinfo(frame)
+                frame_info = cache.frame_info(frame)
                 print_system_log(f'Jumped to: {frame_info.filename} | Line {frame_info.lineno}')
-                selected_var = None
+                selected_var = attributes = methods = None
                 frame_vars = get_variables_from_frame(frame)
                 choices = _get_variable_choices(frame_vars, verbosity)
         else:
@@ -398,7 +431,8 @@ def search_and_show_variables(logger, verbosity):
                 print_system_log(f'There does not exist variable. Please check your input is valid variable name.')
             else:
                 selected_var = choices[choice]
-                print_with_split(f'{selected_var.__class__.__name__} | {selected_var}')
+                attributes, methods = get_variable_info(selected_var)
+                print_with_split(f'{selected_var.__class__.__name__} | {render_value(selected_var)}')
 
 
 def online_execute(frame):
@@ -433,34 +467,40 @@ def online_execute(frame):
                 print(traceback.format_exc())
 
 
-def trace(frame=None, enabled=True):
+def trace(frame=None, enabled=True, logger=None):
     if enabled and not TraceStatus.IN_TRACE:
         TraceStatus.IN_TRACE = True
-        frame = frame or inspect.currentframe().f_back
-        logger = StackLogger()
-        logger.set_stacks(frame)
-        verbosity = 1
-        while True:
-            action = show_main_menu()
-            if action == 'FRAMES':
-                search_and_show_frames(logger, verbosity)
-            elif action == 'SET_VERBOSITY':
-                verbosity = int(inquirer.select(message='Enter a verbosity:', choices=[0, 1, 2]).execute())
-            elif action == 'RETURN':
-                confirm = inquirer.confirm(
-                    message='Return to execute next parts of main code. Continue?',
-                    default=True
-                ).execute()
-                if confirm:
-                    break
-            elif action == 'EXIT':
-                confirm = inquirer.confirm(
-                    message='Terminate main code. It cannot be undone. Continue?',
-                    default=False
-                ).execute()
-                if confirm:
-                    sys.exit(0)
-        TraceStatus.IN_TRACE = False
+        if logger is None:
+            frame = frame or inspect.currentframe().f_back
+            logger = StackLogger()
+            logger.set_stacks(frame)
+        cache = SourceCache()
+        try:
+            verbosity = 1
+            while True:
+                action = show_main_menu()
+                if action == 'FRAMES':
+                    search_and_show_frames(logger, verbosity, cache)
+                elif action == 'SET_VERBOSITY':
+                    verbosity = int(inquirer.select(message='Enter a verbosity:', choices=[0, 1, 2]).execute())
+                elif action == 'RETURN':
+                    confirm = inquirer.confirm(
+                        message='Return to execute next parts of main code. Continue?',
+                        default=True
+                    ).execute()
+                    if confirm:
+                        break
+                elif action == 'EXIT':
+                    confirm = inquirer.confirm(
+                        message='Terminate main code. It cannot be undone. Continue?',
+                        default=False
+                    ).execute()
+                    if confirm:
+                        sys.exit(0)
+        finally:
+            # files mapped for the viewer stay open for the whole session and are released when it ends
+            cache.close()
+            TraceStatus.IN_TRACE = False
 
 
 if __name__ == '__main__':
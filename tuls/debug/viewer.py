@@ -1,46 +1,231 @@
+import bisect
 import curses
+import mmap
+import os
+import re
+import threading
+from array import array
+
+
+class MappedFile:
+    def __init__(self, file_path, encoding='utf-8', chunk_size=1 << 20):
+        self.file = open(file_path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mapping an empty file is an error, so an empty file is simply complete from the start
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.offsets = array('q', [0])
+        self.scanned = 0
+
+    @property
+    def complete(self):
+        return self.scanned >= self.size
+
+    def __len__(self):
+        # lines known so far, the count grows as scanning reaches further into the file
+        if self.complete:
+            return len(self.offsets)-(self.offsets[-1] == self.size)
+        return len(self.offsets)-1
+
+    def _scan(self):
+        end = min(self.scanned+self.chunk_size, self.size)
+        position = self.scanned
+        while True:
+            position = self.mmap.find(b'\n', position, end)
+            if position < 0:
+                break
+            position += 1
+            self.offsets.append(position)
+        self.scanned = end
+
+    def ensure(self, row):
+        while not self.complete and len(self) <= row:
+            self._scan()
+
+    def __getitem__(self, row):
+        self.ensure(row)
+        if not 0 <= row < len(self):
+            raise IndexError(f'row should be 0 <= row < {len(self)}, but {row} is not.')
+        end = self.offsets[row+1] if row+1 < len(self.offsets) else self.size
+        line = self.mmap[self.offsets[row]:end].rstrip(b'\n').rstrip(b'\r')
+        return line.decode(self.encoding, errors='replace')
+
+    def close(self):
+        if self.size:
+            self.mmap.close()
+        self.file.close()
+
+
+class SearchIndex:
+    def __init__(self, mapped_file, query, regex=False, chunk_size=1 << 22):
+        pattern = query.encode(mapped_file.encoding)
+        self.pattern = re.compile(pattern if regex else re.escape(pattern), re.MULTILINE)
+        self.query = query
+        self.mapped_file = mapped_file
+        self.chunk_size = chunk_size
+        # (row, col) of every match in the original file, appended in order while the scan runs
+        self.matches = []
+        self.scanned = 0
+        self.done = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._scan, daemon=True)
+        self.thread.start()
+
+    def _scan(self):
+        mapped = self.mapped_file.mmap
+        size, encoding = self.mapped_file.size, self.mapped_file.encoding
+        position = row = 0
+        while position < size and not self.stopped.is_set():
+            # chunks end on a line boundary, so no match and no row count straddles two chunks
+            end = min(position+self.chunk_size, size)
+            if end < size:
+                newline = mapped.find(b'\n', end-1)
+                end = size if newline < 0 else newline+1
+            chunk = mapped[position:end]
+            last = 0
+            for match in self.pattern.finditer(chunk):
+                start = match.start()
+                if start == match.end():
+                    continue
+                row += chunk.count(b'\n', last, start)
+                line_start = chunk.rfind(b'\n', 0, start)+1
+                self.matches.append((row, len(chunk[line_start:start].decode(encoding, errors='replace'))))
+                last = start
+            row += chunk.count(b'\n', last)
+            position = self.scanned = end
+        self.done = True
+
+    def stop(self):
+        # the scan finishes its current chunk before it sees the flag, the mapped file must outlive it until then
+        self.stopped.set()
+        self.thread.join()
+
+    def next(self, row, col):
+        index = bisect.bisect_right(self.matches, (row, col))
+        if index < len(self.matches):
+            return self.matches[index]
+        # wrapping around is only safe once no later match can still show up
+        if self.done and self.matches:
+            return self.matches[0]
+
+    def previous(self, row, col):
+        index = bisect.bisect_left(self.matches, (row, col))-1
+        if index >= 0:
+            return self.matches[index]
+        if self.done and self.matches:
+            return self.matches[-1]
+
+    def status(self):
+        status = f'{self.query}: {len(self.matches)} matches'
+        if not self.done:
+            status += f' (scanning {self.scanned/max(self.mapped_file.size, 1):.0%})'
+        return status
+
+
+ORIGINAL, ADDED = 0, 1
 
 
 class Buffer:
     def __init__(self, lines):
+        # piece table over lines: pieces are (source, start, end) and end is None for the open tail of the original
         self.lines = lines
+        self.added = []
+        self.pieces = [(ORIGINAL, 0, None)]
+        self.starts = [0]
+
+    def ensure(self, row):
+        if hasattr(self.lines, 'ensure'):
+            self.lines.ensure(row-self.starts[-1]+self.pieces[-1][1])
 
     def __len__(self):
-        return len(self.lines)
+        return self.starts[-1]+len(self.lines)-self.pieces[-1][1]
+
+    def _locate(self, row):
+        index = bisect.bisect_right(self.starts, row)-1
+        return index, row-self.starts[index]
+
+    def _line(self, row):
+        index, offset = self._locate(row)
+        source, start, _ = self.pieces[index]
+        return self.lines[start+offset] if source == ORIGINAL else self.added[start+offset]
 
     def __getitem__(self, index):
-        return self.lines[index]
+        if isinstance(index, slice):
+            start, stop, step = index.start or 0, index.stop, index.step or 1
+            if stop is not None:
+                self.ensure(stop-1)
+            return [self._line(row) for row in range(*slice(start, stop, step).indices(len(self)))]
+        self.ensure(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'index should be 0 <= index < {len(self)}, but {index} is not.')
+        return self._line(index)
 
     @property
     def bottom(self):
         return len(self)-1
 
+    def to_original(self, row):
+        # rows inside edited pieces map to the original row that follows them
+        index, offset = self._locate(row)
+        for source, start, _ in self.pieces[index:]:
+            if source == ORIGINAL:
+                return start+offset
+            offset = 0
+
+    def from_original(self, original_row):
+        for piece_start, (source, start, end) in zip(self.starts, self.pieces):
+            if source == ORIGINAL and start <= original_row and (end is None or original_row < end):
+                return piece_start+original_row-start
+
+    def _split(self, row):
+        index, offset = self._locate(row)
+        if offset == 0:
+            return index
+        source, start, end = self.pieces[index]
+        self.pieces[index:index+1] = [(source, start, start+offset), (source, start+offset, end)]
+        self.starts.insert(index+1, row)
+        return index+1
+
+    def splice(self, row, count, lines):
+        # replacing lines only touches the piece list, the mapped original is never copied
+        self.ensure(row+count)
+        first = self._split(row)
+        last = self._split(row+count)
+        start = len(self.added)
+        self.added.extend(lines)
+        self.pieces[first:last] = [(ADDED, start, len(self.added))] if lines else []
+        self.pieces = [
+            piece for index, piece in enumerate(self.pieces)
+            if piece[2] is None or piece[1] < piece[2]
+        ]
+        self.starts = [0]
+        for source, start, end in self.pieces[:-1]:
+            self.starts.append(self.starts[-1]+end-start)
+
     def insert(self, cursor, string):
         row, col = cursor.row, cursor.col
-        try:
-            current = self.lines.pop(row)
-        except IndexError:
-            current = ''
-        new_line = current[:col]+string+current[col:]
-        self.lines.insert(row, new_line)
+        self.ensure(row)
+        exists = row < len(self)
+        current = self[row] if exists else ''
+        self.splice(row, int(exists), [current[:col]+string+current[col:]])
 
     def split(self, cursor):
         row, col = cursor.row, cursor.col
-        current_line = self.lines.pop(row)
-        self.lines.insert(row, current_line[:col])
-        self.lines.insert(row+1, current_line[col:])
+        current_line = self[row]
+        self.splice(row, 1, [current_line[:col], current_line[col:]])
 
     def backspace(self, cursor):
         row, col = cursor.row, cursor.col
+        self.ensure(row+1)
         if (row, col) < (self.bottom, len(self[row])):
-            current = self.lines.pop(row)
+            current = self[row]
             if col < len(current):
-                new_line = current[:col]+current[col+1:]
-                self.lines.insert(row, new_line)
+                self.splice(row, 1, [current[:col]+current[col+1:]])
             else:
-                next_line = self.lines.pop(row)
-                new_line = current+next_line
-                self.lines.insert(row, new_line)
+                self.splice(row, 2, [current+self[row+1]])
 
     def page_up(self, window, cursor):
         cursor.row = max(0, cursor.row-window.n_rows)
@@ -48,6 +233,7 @@ class Buffer:
         window.horizontal_scroll(cursor)
 
     def page_down(self, window, cursor):
+        self.ensure(cursor.row+window.n_rows)
         cursor.row = min(self.bottom, cursor.row+window.n_rows)
         window.row = cursor.row
         window.horizontal_scroll(cursor)
@@ -143,58 +329,138 @@ def right(window, buffer, cursor):
     window.horizontal_scroll(cursor)
 
 
-def main(stdscr, file_path, start_line=0):
-    with open(file_path) as f:
-        buffer = Buffer(f.read().splitlines())
-
+def jump_to_match(window, buffer, cursor, search, forward=True):
+    row = buffer.to_original(cursor.row)
+    col = cursor.col if buffer.from_original(row) == cursor.row else -1
+    # matches on lines edited in this viewer no longer exist in the buffer and are skipped
+    for _ in range(len(search.matches)):
+        match = search.next(row, col) if forward else search.previous(row, col)
+        if match is None:
+            return False
+        buffer_row = buffer.from_original(match[0])
+        if buffer_row is not None:
+            cursor.row = buffer_row
+            cursor.col = min(match[1], len(buffer[buffer_row]))
+            if not window.row <= cursor.row <= window.bottom:
+                window.row = max(0, cursor.row-window.n_rows//2)
+            window.horizontal_scroll(cursor)
+            return True
+        row, col = match
+    return False
+
+
+def prompt(stdscr, row, message):
+    stdscr.move(row, 0)
+    stdscr.clrtoeol()
+    stdscr.addstr(row, 0, message)
+    curses.echo()
+    try:
+        return stdscr.getstr(row, len(message)).decode(errors='replace')
+    finally:
+        curses.noecho()
+
+
+def start_search(stdscr, window, buffer, forward):
+    query = prompt(stdscr, window.n_rows, '/' if forward else '?')
+    regex = query.startswith('re:')
+    if regex:
+        query = query[3:]
+    if not query or not hasattr(buffer.lines, 'mmap'):
+        return None, ''
+    try:
+        return SearchIndex(buffer.lines, query, regex=regex), ''
+    except re.error as error:
+        return None, f'Invalid pattern: {error}'
+
+
+def main(stdscr, file_path, start_line=0, cache=None):
+    # edits go to the piece table of this viewer, the mapped file shared through the cache is never modified
+    mapped_file = cache.mapped_file(file_path) if cache is not None else MappedFile(file_path)
+    try:
+        _run(stdscr, Buffer(mapped_file), start_line)
+    finally:
+        if cache is None:
+            mapped_file.close()
+
+
+def _run(stdscr, buffer, start_line):
     window = Window(curses.LINES-1, curses.COLS-1)
     cursor = Cursor()
-    cursor.row = start_line-1
-    window.row = start_line-1
+    buffer.ensure(start_line)
+    cursor.row = clamp(start_line-1, 0, max(buffer.bottom, 0))
+    window.row = cursor.row
     window.horizontal_scroll(cursor)
-
-    while True:
-        stdscr.erase()
-        for row, line in enumerate(buffer[window.row:window.row+window.n_rows]):
-            if row == cursor.row-window.row and window.col > 0:
-                line = '«'+line[window.col+1:]
-            if len(line) > window.n_cols:
-                line = line[:window.n_cols-1]+'»'
-            stdscr.addstr(row, 0, line)
-        stdscr.move(*window.translate(cursor))
-
-        k = stdscr.getkey()
-        if k == '\x1b':
-            return
-        elif k == 'KEY_LEFT':
-            left(window, buffer, cursor)
-        elif k == 'KEY_DOWN':
-            cursor.down(buffer)
-            window.down(buffer, cursor)
-            window.horizontal_scroll(cursor)
-        elif k == 'KEY_UP':
-            cursor.up(buffer)
-            window.up(cursor)
-            window.horizontal_scroll(cursor)
-        elif k == 'KEY_RIGHT':
-            right(window, buffer, cursor)
-        elif k == 'KEY_PPAGE':
-            buffer.page_up(window, cursor)
-        elif k == 'KEY_NPAGE':
-            buffer.page_down(window, cursor)
-        elif k == '\n':
-            buffer.split(cursor)
-            right(window, buffer, cursor)
-        elif k == 'KEY_HOME':
-            cursor.col = 0
-            window.horizontal_scroll(cursor)
-        elif k == 'KEY_END':
-            cursor.col = len(buffer[cursor.row])
-            window.horizontal_scroll(cursor)
-
-
-def open_viewer(file_path, start_line=0):
-    return curses.wrapper(main, file_path=file_path, start_line=start_line)
+    search, status, pending = None, '', None
+    try:
+        while True:
+            if pending is not None and (jump_to_match(window, buffer, cursor, search, pending) or search.done):
+                pending = None
+            # only the rows about to be shown, plus one screen ahead, are ever indexed
+            buffer.ensure(window.row+2*window.n_rows)
+            stdscr.erase()
+            for row, line in enumerate(buffer[window.row:window.row+window.n_rows]):
+                if row == cursor.row-window.row and window.col > 0:
+                    line = '«'+line[window.col+1:]
+                if len(line) > window.n_cols:
+                    line = line[:window.n_cols-1]+'»'
+                stdscr.addstr(row, 0, line)
+            if not status and search is not None:
+                status = search.status()
+            stdscr.addstr(window.n_rows, 0, status[:window.n_cols])
+            stdscr.move(*window.translate(cursor))
+
+            # while a scan is running the screen is redrawn periodically so the match count keeps updating
+            stdscr.timeout(100 if search is not None and not search.done else -1)
+            try:
+                k = stdscr.getkey()
+            except curses.error:
+                continue
+            finally:
+                status = ''
+            if k == '\x1b':
+                return
+            elif k in ('/', '?'):
+                if search is not None:
+                    search.stop()
+                stdscr.timeout(-1)
+                search, status = start_search(stdscr, window, buffer, forward=k == '/')
+                pending = None if search is None else k == '/'
+            elif k in ('n', 'N') and search is not None:
+                pending = None
+                if not jump_to_match(window, buffer, cursor, search, forward=k == 'n'):
+                    status = f'{search.query}: no more matches'
+            elif k == 'KEY_LEFT':
+                left(window, buffer, cursor)
+            elif k == 'KEY_DOWN':
+                cursor.down(buffer)
+                window.down(buffer, cursor)
+                window.horizontal_scroll(cursor)
+            elif k == 'KEY_UP':
+                cursor.up(buffer)
+                window.up(cursor)
+                window.horizontal_scroll(cursor)
+            elif k == 'KEY_RIGHT':
+                right(window, buffer, cursor)
+            elif k == 'KEY_PPAGE':
+                buffer.page_up(window, cursor)
+            elif k == 'KEY_NPAGE':
+                buffer.page_down(window, cursor)
+            elif k == '\n':
+                buffer.split(cursor)
+                right(window, buffer, cursor)
+            elif k == 'KEY_HOME':
+                cursor.col = 0
+                window.horizontal_scroll(cursor)
+            elif k == 'KEY_END':
+                cursor.col = len(buffer[cursor.row])
+                window.horizontal_scroll(cursor)
+    finally:
+        if search is not None:
+            search.stop()
+
+
+def open_viewer(file_path, start_line=0, cache=None):
+    return curses.wrapper(main, file_path=file_path, start_line=start_line, cache=cache)
 
 
 if __name__ == '__main__':
@@ -1,14 +1,33 @@
 import importlib.util as iu
 import random
+from functools import lru_cache
 
-if numpy_exists := iu.find_spec('numpy'):
-    import numpy as np
-if torch_exists := iu.find_spec('torch'):
+numpy_exists = iu.find_spec('numpy') is not None
+torch_exists = iu.find_spec('torch') is not None
+
+
+# numpy and torch are imported on first use, so importing tuls.misc stays cheap
+@lru_cache(maxsize=None)
+def _numpy():
+    import numpy
+    return numpy
+
+
+@lru_cache(maxsize=None)
+def _torch():
     import torch
+    return torch
+
+
+@lru_cache(maxsize=None)
+def is_torch_cuda_available():
+    return torch_exists and _torch().cuda.is_available()
+
 
-torch_cuda_available = torch_exists and torch.cuda.is_available()
-if torch_cuda_available:
-    from torch.backends import cudnn
+def __getattr__(name):
+    if name == 'torch_cuda_available':
+        return is_torch_cuda_available()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 class Deterministic:
@@ -30,10 +49,11 @@ class Deterministic:
     def save_state(self):
         self.python_state = random.getstate()
         if numpy_exists:
-            self.numpy_state = np.random.get_state()
+            self.numpy_state = _numpy().random.get_state()
         if torch_exists:
+            torch = _torch()
             self.torch_state = torch.get_rng_state()
-            if torch_cuda_available:
+            if is_torch_cuda_available():
                 self.cuda_state = torch.cuda.get_rng_state()
                 self.cuda_state_all = torch.cuda.get_rng_state_all()
 
@@ -41,13 +61,14 @@ class Deterministic:
         if self.seed is not None:
             random.seed(self.seed)
             if numpy_exists:
-                np.random.seed(self.seed)
+                _numpy().random.seed(self.seed)
             if torch_exists:
+                torch = _torch()
                 torch.manual_seed(self.seed)
-                if torch_cuda_available:
+                if is_torch_cuda_available():
                     torch.cuda.manual_seed(self.seed)
                     torch.cuda.manual_seed_all(self.seed)
-                    cudnn.deterministic = True
+                    torch.backends.cudnn.deterministic = True
 
     def apply(self):
         self.save_state()
@@ -61,10 +82,11 @@ class Deterministic:
         if self.seed is not None:
             random.setstate(self.python_state)
             if numpy_exists:
-                np.random.set_state(self.numpy_state)
+                _numpy().random.set_state(self.numpy_state)
             if torch_exists:
+                torch = _torch()
                 torch.set_rng_state(self.torch_state)
-                if torch_cuda_available:
+                if is_torch_cuda_available():
                     torch.cuda.set_rng_state(self.cuda_state)
                     torch.cuda.set_rng_state_all(self.cuda_state_all)
-                    cudnn.deterministic = False
+                    torch.backends.cudnn.deterministic = False
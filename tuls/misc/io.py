@@ -1,9 +1,166 @@
+import io
 import os
+import queue
+import threading
+import uuid
 from contextlib import contextmanager
 
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def _open_compressed(raw, compression, level=None):
+    if compression == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9 if level is None else level)
+    elif compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(raw, mode='wb', compresslevel=9 if level is None else level)
+    elif compression == 'lzma':
+        import lzma
+        return lzma.LZMAFile(raw, mode='wb', preset=level)
+    else:
+        raise ValueError(f'compression should be one of gzip, bz2 or lzma, but {compression} is not.')
+
+
+class BackgroundWriter:
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.pending_size = 0
+        self.queue = queue.SimpleQueue()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunks = [self.queue.get()]
+            try:
+                while True:
+                    chunks.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = chunks[-1] is None
+            if stop:
+                chunks.pop()
+            if chunks and self.error is None:
+                try:
+                    self.f.write(chunks[0][:0].join(chunks))
+                except Exception as e:
+                    self.error = e
+            if stop:
+                break
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise self.error
+
+    def _submit(self):
+        if self.pending:
+            self.queue.put(self.pending[0][:0].join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        # batch small writes on the producer side to keep queue traffic low
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= self.chunk_size:
+            self._submit()
+        return len(data)
+
+    def flush(self):
+        self._submit()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def close(self):
+        if self.thread.is_alive():
+            self._submit()
+            self.queue.put(None)
+            self.thread.join()
+        self._raise_if_failed()
+
+
+def _close_layers(f, raw):
+    # detaching/closing the text and compression layers flushes them but leaves raw open
+    if isinstance(f, io.TextIOWrapper):
+        f = f.detach()
+    if f is not raw:
+        f.close()
+    raw.flush()
+
+
+def _fsync_directory(directory):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
 
 @contextmanager
-def fast_write(path, mode='w'):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, mode) as f:
-        yield f
+def fast_write(
+    path,
+    mode='w',
+    buffer_size=DEFAULT_BUFFER_SIZE,
+    atomic=False,
+    fsync=False,
+    background=False,
+    compression=None,
+    compression_level=None,
+    encoding=None
+):
+    if mode not in ('w', 'wb', 'a', 'ab'):
+        raise ValueError(f'mode should be one of w, wb, a or ab, but {mode} is not.')
+    if atomic and 'a' in mode:
+        raise ValueError('atomic write cannot be used with append mode.')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if atomic:
+        target_path = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        raw = os.fdopen(fd, 'wb', buffering=buffer_size)
+    else:
+        target_path = path
+        raw = open(path, 'ab' if 'a' in mode else 'wb', buffering=buffer_size)
+    if compression is None:
+        f = raw
+    else:
+        # compressors are slow on tiny chunks, so feed them through their own buffer
+        f = io.BufferedWriter(_open_compressed(raw, compression, compression_level), buffer_size)
+    if 'b' not in mode:
+        f = io.TextIOWrapper(f, encoding=encoding or 'utf-8')
+    writer = BackgroundWriter(f) if background else f
+    committed = False
+    try:
+        yield writer
+        if background:
+            writer.close()
+        _close_layers(f, raw)
+        if fsync:
+            os.fsync(raw.fileno())
+        committed = True
+    finally:
+        if not committed:
+            try:
+                if background:
+                    writer.close()
+                _close_layers(f, raw)
+            except Exception:
+                pass
+        raw.close()
+        if atomic:
+            if committed:
+                os.replace(target_path, path)
+                if fsync:
+                    _fsync_directory(directory or '.')
+            else:
+                os.remove(target_path)
@@ -1,4 +1,7 @@
+import heapq
+import math
 import random
+from itertools import islice
 from typing import Iterable
 
 
@@ -13,15 +16,119 @@ def ensure_sequence(item):
     return item
 
 
-def sample_by_ratio(items, ratio, sort=False):
-    num_samples = int(len(items)*ratio)
-    sample_indices = random.sample(list(range(len(items))), num_samples)
+def _uniform():
+    # (0, 1] to keep log() finite
+    return 1.0-random.random()
+
+
+def _skip(iterator, count):
+    return next(islice(iterator, count, count+1), _skip)
+
+
+def sample_indices(num_items, num_samples, weights=None, sort=False):
+    import numpy as np
+
+    # derive the generator from the global numpy state so Deterministic still applies
+    rng = np.random.default_rng(np.random.randint(0, 2**63-1, dtype=np.int64))
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (num_items,):
+            raise ValueError(f'weights should have shape ({num_items},), but got {weights.shape}.')
+        weights = weights/weights.sum()
+    indices = rng.choice(num_items, size=num_samples, replace=False, p=weights, shuffle=not sort)
     if sort:
-        sample_indices.sort()
-    return [items[index] for index in sample_indices]
+        indices.sort()
+    return indices
+
+
+def stream_sample_by_ratio(iterable, ratio, weight_fn=None):
+    # the ratio is checked here so a bad value raises at the call, not at the first next()
+    if not 0 <= ratio <= 1:
+        raise ValueError(f'ratio should be 0 <= ratio <= 1, but {ratio} is not.')
+    return _stream_sample_by_ratio(iterable, ratio, weight_fn)
+
+
+def _stream_sample_by_ratio(iterable, ratio, weight_fn):
+    if ratio == 0:
+        return
+    iterator = iter(iterable)
+    if weight_fn is not None:
+        for item in iterator:
+            if random.random() < ratio*weight_fn(item):
+                yield item
+    elif ratio == 1:
+        yield from iterator
+    else:
+        # bernoulli sampling by geometric skips, one random draw per selected item
+        log_complement = math.log(1.0-ratio)
+        while True:
+            item = _skip(iterator, int(math.log(_uniform())/log_complement))
+            if item is _skip:
+                break
+            yield item
+
+
+def reservoir_sample(iterable, num_samples, weight_fn=None, sort=False):
+    if num_samples <= 0:
+        return []
+    iterator = iter(iterable)
+    if weight_fn is not None:
+        # A-Res: keep items with the largest u^(1/w) keys
+        heap = []
+        for index, item in enumerate(iterator):
+            weight = weight_fn(item)
+            if weight <= 0:
+                continue
+            key = math.log(_uniform())/weight
+            if len(heap) < num_samples:
+                heapq.heappush(heap, (key, index, item))
+            elif key > heap[0][0]:
+                heapq.heapreplace(heap, (key, index, item))
+        reservoir = [(index, item) for _, index, item in heap]
+    else:
+        # algorithm L
+        reservoir = list(enumerate(islice(iterator, num_samples)))
+        if len(reservoir) == num_samples:
+            index = num_samples-1
+            w = math.exp(math.log(_uniform())/num_samples)
+            while True:
+                skip = int(math.log(_uniform())/math.log(1.0-w)) if w < 1 else 0
+                item = _skip(iterator, skip)
+                if item is _skip:
+                    break
+                index += skip+1
+                reservoir[random.randrange(num_samples)] = (index, item)
+                w *= math.exp(math.log(_uniform())/num_samples)
+    if sort:
+        reservoir.sort(key=lambda indexed_item: indexed_item[0])
+    else:
+        random.shuffle(reservoir)
+    return [item for _, item in reservoir]
+
+
+def sample_by_ratio(items, ratio, sort=False, weights=None):
+    num_samples = int(len(items)*ratio)
+    if weights is None:
+        # the unweighted path keeps drawing from random, so callers seeding only random stay reproducible
+        indices = random.sample(range(len(items)), num_samples)
+        if sort:
+            indices.sort()
+        return [items[index] for index in indices]
+    import numpy as np
+
+    # items with zero weight can never be drawn, the sample shrinks to what can be drawn without replacement
+    num_samples = min(num_samples, int(np.count_nonzero(np.asarray(weights, dtype=np.float64))))
+    indices = sample_indices(len(items), num_samples, weights=weights, sort=sort)
+    return [items[index] for index in indices.tolist()]
 
 
-def sample_by_random_sampling_range(items, sampling_range, sort=False):
+def sample_by_random_sampling_range(items, sampling_range, sort=False, weights=None):
     lb, ub = min(sampling_range), max(sampling_range)
     ratio = random.random()*(ub-lb)+lb
-    return sample_by_ratio(items, ratio, sort=sort)
+    if hasattr(items, '__len__') and hasattr(items, '__getitem__'):
+        if callable(weights):
+            weights = [weights(item) for item in items]
+        return sample_by_ratio(items, ratio, sort=sort, weights=weights)
+    if weights is not None and not callable(weights):
+        raise TypeError('weights should be callable when items is not a sized sequence.')
+    return list(stream_sample_by_ratio(items, ratio, weight_fn=weights))
@@ -1,6 +1,33 @@
+import re
 from typing import Sequence, Dict
 
 
+class LiteralType:
+    STRING = 0
+    INT = 1
+    FLOAT = 2
+    HEX = 3
+    BOOL = 4
+    NONE = 5
+    NAMES = ('string', 'int', 'float', 'hex', 'bool', 'none')
+
+
+_LITERAL_PATTERN = re.compile(
+    r'(?P<int>[+-]?\d+)'
+    r'|(?P<float>[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?|[+-]?(?:inf|nan))'
+    r'|(?P<hex>0[xX][0-9a-fA-F]+)'
+    r'|(?P<bool>True|False)'
+    r'|(?P<none>None)'
+)
+_LITERAL_GROUPS = {
+    'int': (LiteralType.INT, int),
+    'float': (LiteralType.FLOAT, float),
+    'hex': (LiteralType.HEX, lambda string: int(string, 16)),
+    'bool': (LiteralType.BOOL, lambda string: string == 'True'),
+    'none': (LiteralType.NONE, lambda string: None)
+}
+
+
 def replace_all(string: str, mappings: Dict[str, str] = None):
     if mappings is None:
         mappings = {}
@@ -13,11 +40,57 @@ def remove_all(string: str, targets: Sequence[str]):
     return replace_all(string, {target: '' for target in targets})
 
 
+def classify_literal(string: str, return_value=False):
+    match = _LITERAL_PATTERN.fullmatch(string)
+    if match is None:
+        category, value = LiteralType.STRING, string
+    else:
+        category, parser = _LITERAL_GROUPS[match.lastgroup]
+        value = parser(string) if return_value else None
+    if return_value:
+        return category, value
+    return category
+
+
+def classify_literals(strings, return_values=False):
+    import numpy as np
+
+    if isinstance(strings, np.ndarray):
+        shape = strings.shape
+        strings = strings.ravel().tolist()
+    else:
+        strings = list(strings)
+        shape = (len(strings),)
+    # token columns are highly repetitive, so each distinct token is matched once and scattered back by its code
+    codes = dict()
+    inverse = np.fromiter(
+        (codes.setdefault(string, len(codes)) for string in strings), dtype=np.intp, count=len(strings)
+    )
+    categories = np.empty(len(codes), dtype=np.int8)
+    values = np.empty(len(codes), dtype=object) if return_values else None
+    fullmatch = _LITERAL_PATTERN.fullmatch
+    for string, index in codes.items():
+        if not isinstance(string, str):
+            raise TypeError(f'strings should contain only str, but {string!r} is not.')
+        match = fullmatch(string)
+        if match is None:
+            categories[index] = LiteralType.STRING
+            if return_values:
+                values[index] = string
+        else:
+            category, parser = _LITERAL_GROUPS[match.lastgroup]
+            categories[index] = category
+            if return_values:
+                values[index] = parser(string)
+    categories = categories[inverse].reshape(shape)
+    if return_values:
+        return categories, values[inverse].reshape(shape)
+    return categories
+
+
 def is_hex(string: str):
-    return string.startswith('0x') and all(map(lambda c: 'A' <= c <= 'F' or '0' <= c <= '9', string[2:]))
+    return classify_literal(string) == LiteralType.HEX
 
 
 def is_string(string: str):
-    string = remove_all(string, ('e+', 'e-', 'E+', 'E-', '.'))
-    return not (string.isnumeric() or string in ('True', 'False', 'None') or is_hex(string))
-
+    return classify_literal(string) == LiteralType.STRING
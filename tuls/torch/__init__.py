@@ -1,7 +1,13 @@
-from typing import Sequence
+import copy
+from collections import defaultdict
+from typing import Sequence, Mapping
 
+import torch
 from torch import nn
 
+# tensors larger than this are moved on their own, packing them would only add a copy
+BULK_TRANSFER_MAX_NUMEL = 1 << 20
+
 
 def transfer_module_or_tensor(module_or_tensor, training=None, dtype=None, device=None):
     if training is not None and isinstance(module_or_tensor, nn.Module):
@@ -13,17 +19,134 @@ def transfer_module_or_tensor(module_or_tensor, training=None, dtype=None, devic
     return module_or_tensor
 
 
-def transfer(modules_or_tensors, training=None, dtype=None, device=None):
+def transfer(modules_or_tensors, training=None, dtype=None, device=None, bulk=False, non_blocking=False):
+    if bulk:
+        if training is not None:
+            for module in _iter_modules(modules_or_tensors):
+                module.train(training)
+        return bulk_transfer(modules_or_tensors, dtype=dtype, device=device, non_blocking=non_blocking)
     if isinstance(modules_or_tensors, Sequence):
-        modules_or_tensors = []
-        for module in modules_or_tensors:
-            modules_or_tensors.append(transfer_module_or_tensor(module, training=training, dtype=dtype, device=device))
+        modules_or_tensors = [
+            transfer_module_or_tensor(module, training=training, dtype=dtype, device=device)
+            for module in modules_or_tensors
+        ]
     else:
         for name, module in modules_or_tensors.items():
             modules_or_tensors[name] = transfer_module_or_tensor(module, training=training, dtype=dtype, device=device)
     return modules_or_tensors
 
 
+def _iter_modules(data):
+    if isinstance(data, nn.Module):
+        yield data
+    elif isinstance(data, Mapping):
+        for value in data.values():
+            yield from _iter_modules(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            yield from _iter_modules(value)
+
+
+def _collect_tensors(data, tensors, module_flags=None):
+    if isinstance(data, torch.Tensor):
+        tensors.append(data)
+        if module_flags is not None:
+            module_flags.append(False)
+    elif isinstance(data, nn.Module):
+        # modules are converted in place through .data, so their tensors take the no-grad path
+        module_tensors = [parameter.detach() for parameter in data.parameters()]
+        module_tensors += [buffer.detach() for buffer in data.buffers()]
+        tensors.extend(module_tensors)
+        if module_flags is not None:
+            module_flags.extend([True]*len(module_tensors))
+    elif isinstance(data, Mapping):
+        for value in data.values():
+            _collect_tensors(value, tensors, module_flags)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            _collect_tensors(value, tensors, module_flags)
+
+
+def _replace_tensors(data, tensors):
+    if isinstance(data, torch.Tensor):
+        return next(tensors)
+    elif isinstance(data, nn.Module):
+        with torch.no_grad():
+            for parameter in data.parameters():
+                parameter.data = next(tensors)
+                # like nn.Module.to, gradients follow their parameter to its new device and dtype
+                if parameter.grad is not None:
+                    parameter.grad.data = parameter.grad.data.to(device=parameter.device, dtype=parameter.dtype)
+            for buffer in data.buffers():
+                buffer.data = next(tensors)
+        return data
+    elif isinstance(data, Mapping):
+        replaced = {key: _replace_tensors(value, tensors) for key, value in data.items()}
+        if isinstance(data, dict):
+            replaced_data = copy.copy(data)
+            replaced_data.update(replaced)
+            return replaced_data
+        return type(data)(replaced)
+    elif isinstance(data, tuple):
+        replaced = [_replace_tensors(value, tensors) for value in data]
+        return type(data)(*replaced) if hasattr(data, '_fields') else type(data)(replaced)
+    elif isinstance(data, list):
+        return [_replace_tensors(value, tensors) for value in data]
+    return data
+
+
+def _transfer_group(tensors, dtype, device, non_blocking, pin_memory):
+    source = tensors[0]
+    if len(tensors) == 1:
+        return [source.to(device=device, dtype=dtype, non_blocking=non_blocking)]
+    numels = [tensor.numel() for tensor in tensors]
+    pinned = pin_memory and source.device.type == 'cpu' and device.type == 'cuda' and torch.cuda.is_available()
+    # narrow on the source side and widen on the destination side to move as few bytes as possible
+    convert_first = dtype.itemsize < source.dtype.itemsize
+    views = [tensor.reshape(-1) for tensor in tensors]
+    if pinned and not convert_first:
+        flat = torch.empty(sum(numels), dtype=source.dtype, pin_memory=True)
+        torch.cat(views, out=flat)
+    else:
+        flat = torch.cat(views)
+        if convert_first:
+            flat = flat.to(dtype=dtype)
+        if pinned:
+            flat = flat.pin_memory()
+    flat = flat.to(device=device, dtype=dtype, non_blocking=non_blocking or pinned)
+    return [chunk.view(tensor.shape) for chunk, tensor in zip(flat.split(numels), tensors)]
+
+
+def bulk_transfer(data, dtype=None, device=None, non_blocking=False, pin_memory=True):
+    tensors, module_flags = [], []
+    _collect_tensors(data, tensors, module_flags)
+    if device is not None:
+        device = torch.device(device)
+        if device.type == 'cuda' and device.index is None:
+            device = torch.device('cuda', torch.cuda.current_device())
+    groups = defaultdict(list)
+    results = list(tensors)
+    for index, (tensor, in_module) in enumerate(zip(tensors, module_flags)):
+        # the same casts as transfer: bare tensors follow Tensor.to, module tensors follow nn.Module.to
+        castable = not in_module or tensor.is_floating_point() or tensor.is_complex()
+        target_dtype = dtype if dtype is not None and castable else tensor.dtype
+        target_device = device or tensor.device
+        if target_dtype == tensor.dtype and target_device == tensor.device:
+            continue
+        # packing saves copies only across devices, a cast on the same device is fastest tensor by tensor
+        if target_device == tensor.device or tensor.numel() > BULK_TRANSFER_MAX_NUMEL or tensor.requires_grad:
+            results[index] = tensor.to(device=target_device, dtype=target_dtype, non_blocking=non_blocking)
+        else:
+            groups[(tensor.dtype, tensor.device, target_dtype, target_device)].append(index)
+    for (_, _, target_dtype, target_device), indices in groups.items():
+        transferred = _transfer_group(
+            [tensors[index] for index in indices], target_dtype, target_device, non_blocking, pin_memory
+        )
+        for index, tensor in zip(indices, transferred):
+            results[index] = tensor
+    return _replace_tensors(data, iter(results))
+
+
 def get_named_parameters(modules):
     parameters = dict()
     if isinstance(modules, Sequence):
@@ -44,5 +167,53 @@ def set_requires_grad(module, mode=True):
         param.requires_grad_(mode)
 
 
-def tensor_to_numpy(x):
-    return x.clone().detach().cpu().numpy()
+def _collect_arrays(data, arrays):
+    import numpy as np
+
+    if isinstance(data, Mapping):
+        for value in data.values():
+            _collect_arrays(value, arrays)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            _collect_arrays(value, arrays)
+    elif isinstance(data, np.ndarray):
+        # out may mirror a structure with non-tensor leaves, only its arrays line up with the tensors
+        arrays.append(data)
+
+
+def _host_tensor_to_numpy(tensor, copy):
+    if tensor.dtype == torch.bfloat16:
+        return tensor.float().numpy()
+    # tensors requiring grad are always copied so writes to the array never reach autograd leaves
+    if copy or tensor.requires_grad:
+        return tensor.detach().numpy().copy()
+    return tensor.numpy()
+
+
+@torch.no_grad()
+def tensor_to_numpy(x, copy=True, out=None):
+    module = next(_iter_modules(x), None)
+    if module is not None:
+        raise TypeError(f'x should contain only tensors and containers, but {module.__class__.__name__} is not.')
+    tensors = []
+    _collect_tensors(x, tensors)
+    device_types = {tensor.device.type for tensor in tensors if tensor.device.type != 'cpu'}
+    if out is not None:
+        results = []
+        _collect_arrays(out, results)
+        if len(results) != len(tensors):
+            raise ValueError(f'out should have {len(tensors)} arrays, but has {len(results)}.')
+        for tensor, array in zip(tensors, results):
+            torch.from_numpy(array).copy_(tensor.detach(), non_blocking=True)
+    else:
+        # device tensors are packed into one buffer per dtype and copied to the host without syncing
+        results = bulk_transfer([tensor.detach() for tensor in tensors], device='cpu', non_blocking=True)
+    for device_type in device_types:
+        getattr(torch, device_type).synchronize()
+    if out is None:
+        results = [
+            _host_tensor_to_numpy(tensor, copy) if tensor.device.type == 'cpu'
+            else _host_tensor_to_numpy(host_tensor, copy=False)
+            for tensor, host_tensor in zip(tensors, results)
+        ]
+    return _replace_tensors(x, iter(results))
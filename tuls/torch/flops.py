@@ -0,0 +1,219 @@
+import math
+
+import torch
+from torch import nn
+from torch.nn import functional as F
+from torch.overrides import TorchFunctionMode
+from beacon.adict import ADict
+
+from tuls.torch import _collect_tensors
+from tuls.torch.hooks import Hook
+from tuls.torch.layers.affine import Affine
+
+# module type -> function(module, inputs, outputs) returning multiply-accumulate count
+MAC_COUNTERS = dict()
+
+
+def register_mac_counter(*module_types):
+    def decorator(counter):
+        for module_type in module_types:
+            MAC_COUNTERS[module_type] = counter
+        return counter
+    return decorator
+
+
+def get_mac_counter(module):
+    for module_type in type(module).__mro__:
+        if module_type in MAC_COUNTERS:
+            return MAC_COUNTERS[module_type]
+
+
+def _first_tensor(value):
+    tensors = []
+    _collect_tensors(value, tensors)
+    return tensors[0] if tensors else None
+
+
+@register_mac_counter(nn.Linear, nn.Bilinear)
+def count_linear(module, inputs, outputs):
+    in_features = module.in1_features*module.in2_features if isinstance(module, nn.Bilinear) else module.in_features
+    return outputs.numel()*in_features
+
+
+@register_mac_counter(nn.Conv1d, nn.Conv2d, nn.Conv3d)
+def count_conv(module, inputs, outputs):
+    return outputs.numel()*module.in_channels//module.groups*math.prod(module.kernel_size)
+
+
+@register_mac_counter(nn.ConvTranspose1d, nn.ConvTranspose2d, nn.ConvTranspose3d)
+def count_conv_transpose(module, inputs, outputs):
+    return inputs[0].numel()*module.out_channels//module.groups*math.prod(module.kernel_size)
+
+
+@register_mac_counter(
+    nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d,
+    nn.InstanceNorm1d, nn.InstanceNorm2d, nn.InstanceNorm3d,
+    nn.LayerNorm, nn.GroupNorm
+)
+def count_norm(module, inputs, outputs):
+    # normalization plus the optional elementwise affine
+    affine = getattr(module, 'affine', False) or getattr(module, 'elementwise_affine', False)
+    return outputs.numel()*(2 if affine else 1)
+
+
+@register_mac_counter(Affine)
+def count_affine(module, inputs, outputs):
+    return outputs.numel()
+
+
+@register_mac_counter(nn.MultiheadAttention)
+def count_multihead_attention(module, inputs, outputs):
+    query, key = inputs[0], inputs[1]
+    if query.dim() == 2:
+        query, key = query.unsqueeze(1), key.unsqueeze(1)
+    elif module.batch_first:
+        query, key = query.transpose(0, 1), key.transpose(0, 1)
+    target_length, batch_size, embed_dim = query.shape
+    source_length = key.shape[0]
+    projections = batch_size*(target_length*embed_dim*embed_dim+source_length*(module.kdim+module.vdim)*embed_dim)
+    attention = 2*batch_size*target_length*source_length*embed_dim
+    return projections+attention+batch_size*target_length*embed_dim*embed_dim
+
+
+def _count_matmul(func, args, kwargs, outputs):
+    if func in (torch.matmul, torch.Tensor.matmul, torch.Tensor.__matmul__, torch.bmm, torch.mm):
+        return outputs.numel()*args[0].shape[-1]
+    elif func in (torch.baddbmm, torch.addmm, torch.addbmm):
+        return outputs.numel()*args[1].shape[-1]
+    elif func is F.scaled_dot_product_attention:
+        query, key = args[0], args[1]
+        return 2*query.shape[:-1].numel()*key.shape[-2]*query.shape[-1]
+    return 0
+
+
+class _MatmulCounterMode(TorchFunctionMode):
+    def __init__(self, counter):
+        super().__init__()
+        self.counter = counter
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or dict()
+        outputs = func(*args, **kwargs)
+        # functional matmuls are charged to the innermost module unless a registered counter already covers it
+        if self.counter.stack and not self.counter.covered and isinstance(outputs, torch.Tensor):
+            macs = _count_matmul(func, args, kwargs, outputs)
+            if macs:
+                self.counter.registry[self.counter.stack[-1][0]].macs += macs
+        return outputs
+
+
+class FlopCounter(Hook):
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.covered = 0
+        self.modules = dict()
+
+    def _stats(self, name, module):
+        if name not in self.registry:
+            self.registry[name] = ADict(
+                type=module.__class__.__name__,
+                macs=0,
+                calls=0,
+                activation_bytes=0,
+                output_shape=None
+            )
+        return self.registry[name]
+
+    def _pre_hook(self, name, module):
+        self._stats(name, module)
+        # a module is counted only when no enclosing module has already been counted as a whole
+        counted = not self.covered and get_mac_counter(module) is not None
+        self.stack.append((name, counted))
+        self.covered += counted
+
+    def _post_hook(self, name, module, inputs, outputs):
+        stats = self._stats(name, module)
+        _, counted = self.stack.pop()
+        if counted:
+            self.covered -= 1
+            output = _first_tensor(outputs)
+            if output is not None:
+                stats.macs += get_mac_counter(module)(module, inputs, output)
+        tensors = []
+        _collect_tensors(outputs, tensors)
+        stats.calls += 1
+        stats.activation_bytes += sum(tensor.numel()*tensor.element_size() for tensor in tensors)
+        if tensors:
+            stats.output_shape = tuple(tensors[0].shape)
+
+    def _register(self, name, module):
+        return [
+            module.register_forward_pre_hook(lambda _, inputs: self._pre_hook(name, module)),
+            module.register_forward_hook(lambda _, inputs, outputs: self._post_hook(name, module, inputs, outputs))
+        ]
+
+    @torch.no_grad()
+    def analyze(self, model, *inputs, **kwargs):
+        self.registry.clear()
+        self.modules = dict()
+        for name, module in model.named_modules():
+            name = name or model.__class__.__name__
+            self.modules[name] = module
+            self._capture(name, lambda name=name, module=module: self._register(name, module))
+        try:
+            with _MatmulCounterMode(self):
+                model(*inputs, **kwargs)
+        finally:
+            self.release()
+            self.stack.clear()
+            self.covered = 0
+        return self.summary()
+
+    def summary(self):
+        # inclusive MACs are accumulated bottom-up along dotted module names
+        names = list(self.modules)
+        root = names[0] if names else None
+        macs = dict.fromkeys(names, 0)
+        for name in reversed(names):
+            if name in self.registry:
+                macs[name] += self.registry[name].macs
+            if name != root:
+                macs[name.rsplit('.', 1)[0] if '.' in name else root] += macs[name]
+        rows = []
+        for name, module in self.modules.items():
+            stats = self.registry.get(name)
+            rows.append(ADict(
+                name=name,
+                type=module.__class__.__name__,
+                macs=macs[name],
+                flops=2*macs[name],
+                parameters=sum(parameter.numel() for parameter in module.parameters()),
+                calls=stats.calls if stats else 0,
+                activation_bytes=stats.activation_bytes if stats else 0,
+                output_shape=stats.output_shape if stats else None
+            ))
+        return rows
+
+    def table(self, max_depth=None):
+        rows = self.summary()
+        if max_depth is not None:
+            rows = [row for row in rows if row.name.count('.') < max_depth or row is rows[0]]
+        name_width = max([len(row.name) for row in rows]+[6])
+        lines = [
+            f'{"Module":<{name_width}} | {"Type":<20} | {"Params":>12} | {"GMACs":>10} | '
+            f'{"GFLOPs":>10} | {"Act(MB)":>10} | Output'
+        ]
+        lines.append('-'*len(lines[0]))
+        for row in rows:
+            lines.append(
+                f'{row.name:<{name_width}} | {row.type:<20} | {row.parameters:>12,d} | {row.macs/1e9:>10.4f} | '
+                f'{row.flops/1e9:>10.4f} | {row.activation_bytes/2**20:>10.3f} | {row.output_shape}'
+            )
+        return '\n'.join(lines)
+
+
+def analyze_flops(model, *inputs, **kwargs):
+    counter = FlopCounter()
+    counter.analyze(model, *inputs, **kwargs)
+    return counter
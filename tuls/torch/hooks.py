@@ -1,46 +1,301 @@
+import functools
 import inspect
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
 
+import torch
 from beacon.adict import ADict
 
+from tuls.torch import _collect_tensors, _replace_tensors
+
+
+def _numpy_dtype(dtype):
+    # numpy has no bfloat16, spilled bfloat16 tensors are widened to float32
+    if dtype == torch.bfloat16:
+        dtype = torch.float32
+    return torch.empty((), dtype=dtype).numpy().dtype
+
+
+def _make_binder(func):
+    # the binding plan is built once per function, plain signatures skip inspect entirely per call
+    signature = inspect.signature(func)
+    parameters = list(signature.parameters.values())
+    if all(parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD) for parameter in parameters):
+        names = [parameter.name for parameter in parameters]
+        defaults = [parameter.default for parameter in parameters]
+
+        def bind(args, kwargs):
+            inputs = list(args)
+            if kwargs or len(args) < len(names):
+                for name, default in zip(names[len(args):], defaults[len(args):]):
+                    inputs.append(kwargs.get(name, default))
+            return inputs
+    else:
+        def bind(args, kwargs):
+            bound_args = signature.bind_partial(*args, **kwargs)
+            bound_args.apply_defaults()
+            return [bound_args.arguments.get(parameter.name) for parameter in parameters]
+    return bind
+
+
+class CapturePolicy:
+    def __init__(
+        self,
+        detach=True,
+        summary=False,
+        dtype=None,
+        offload=False,
+        max_calls=None,
+        spill_dir=None
+    ):
+        self.detach = detach
+        self.summary = summary
+        self.dtype = dtype
+        self.offload = offload
+        self.max_calls = max_calls
+        self.spill_dir = spill_dir
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def summarize(tensor):
+        values = tensor.detach().float()
+        if values.numel() == 0:
+            stats = torch.full((5,), float('nan'), device=values.device)
+        else:
+            std, mean = torch.std_mean(values) if values.numel() > 1 else (values.new_zeros(()), values.mean())
+            stats = torch.stack([mean, std, torch.linalg.vector_norm(values), values.min(), values.max()])
+        return ADict(shape=tuple(tensor.shape), dtype=tensor.dtype, stats=stats)
+
+    def _spill(self, tensor, path):
+        import numpy as np
+
+        # slot files are reused, a fresh file is swapped in so arrays still mapping the evicted one stay valid
+        temp_path = f'{path}.tmp'
+        array = np.lib.format.open_memmap(
+            temp_path, mode='w+', dtype=_numpy_dtype(tensor.dtype), shape=tuple(tensor.shape)
+        )
+        torch.from_numpy(array).copy_(tensor)
+        array.flush()
+        os.replace(temp_path, path)
+        return array
+
+    @torch.no_grad()
+    def _apply_tensor(self, tensor, prefix, index):
+        if self.detach:
+            tensor = tensor.detach()
+        if self.dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(dtype=self.dtype)
+        if self.summary:
+            summary = self.summarize(tensor)
+            if self.offload:
+                summary.stats = summary.stats.to('cpu', non_blocking=True)
+            return summary
+        if self.spill_dir is not None:
+            return self._spill(tensor, os.path.join(self.spill_dir, f'{prefix}_{index}.npy'))
+        if self.offload:
+            # non_blocking device to host copies land in pinned memory and do not stall the forward
+            tensor = tensor.to('cpu', non_blocking=True)
+        return tensor
+
+    def apply(self, value, prefix='capture', events=None):
+        tensors = []
+        _collect_tensors(value, tensors)
+        if not tensors:
+            return value
+        results = [self._apply_tensor(tensor, prefix, index) for index, tensor in enumerate(tensors)]
+        offloaded = self.offload and (self.summary or self.spill_dir is None)
+        if events is not None and offloaded and any(tensor.is_cuda for tensor in tensors):
+            # the host copies are still in flight, the event marks when they can be read
+            event = torch.cuda.Event()
+            event.record()
+            events.append(event)
+        return _replace_tensors(value, iter(results))
+
 
 class Hook:
-    def __init__(self):
+    GLOBAL_ENABLED = True
+    _instances = weakref.WeakSet()
+
+    def __init__(self, policy=None, enabled=True):
         self.registry = ADict(default=ADict())
+        self.policy = policy
+        self.policies = dict()
+        self.num_calls = dict()
+        self.enabled = enabled
+        # name -> function registering the hooks, and name -> handles currently registered
+        self.captures = dict()
+        self.handles = dict()
+        # name -> event recorded after the last offloaded capture, waited on before its values are read
+        self.copy_events = dict()
+        Hook._instances.add(self)
+
+    @classmethod
+    def set_global_enabled(cls, enabled):
+        cls.GLOBAL_ENABLED = enabled
+        for hook in list(cls._instances):
+            hook._sync_handles()
+
+    @classmethod
+    @contextmanager
+    def globally_disabled(cls):
+        enabled = cls.GLOBAL_ENABLED
+        cls.set_global_enabled(False)
+        try:
+            yield
+        finally:
+            cls.set_global_enabled(enabled)
+
+    def is_enabled(self):
+        return self.enabled and Hook.GLOBAL_ENABLED
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self._sync_handles()
+
+    def _sync_handles(self):
+        # disabling removes the hooks from modules entirely, so a disabled capture costs nothing per forward
+        if self.is_enabled():
+            for name, register in self.captures.items():
+                if name not in self.handles:
+                    self.handles[name] = register()
+        else:
+            for handles in self.handles.values():
+                for handle in handles:
+                    handle.remove()
+            self.handles.clear()
+
+    def _capture(self, name, register):
+        self.release(name)
+        self.captures[name] = register
+        if self.is_enabled():
+            self.handles[name] = register()
+        return self.handles.get(name, [])
+
+    def release(self, name=None):
+        names = list(self.captures) if name is None else [name]
+        for name in names:
+            for handle in self.handles.pop(name, []):
+                handle.remove()
+            self.captures.pop(name, None)
+
+    def synchronize(self, name=None):
+        names = list(self.copy_events) if name is None else [name]
+        for name in names:
+            event = self.copy_events.pop(name, None)
+            if event is not None:
+                event.synchronize()
+
+    def get(self, name):
+        self.synchronize(name)
+        return self.registry[name]
+
+    def _record(self, name, **values):
+        policy = self.policies.get(name, self.policy)
+        if policy is None:
+            for key, value in values.items():
+                self.registry[name][key] = value
+            return
+        call_index = self.num_calls.get(name, 0)
+        self.num_calls[name] = call_index+1
+        # spill files cycle through one slot per kept call, so the disk holds no more than the history does
+        slot = call_index % (policy.max_calls or 1)
+        events = []
+        values = {
+            key: policy.apply(value, prefix=f'{name}_{slot}_{key}', events=events)
+            for key, value in values.items()
+        }
+        if events:
+            self.copy_events[name] = events[-1]
+        for key, value in values.items():
+            self.registry[name][key] = value
+        if policy.max_calls is not None:
+            if 'history' not in self.registry[name]:
+                self.registry[name]['history'] = deque(maxlen=policy.max_calls)
+            self.registry[name]['history'].append(ADict(call_index=call_index, **values))
 
     def _module_pre_hook(self, name, inputs, pre_action=None):
         if pre_action is not None:
             return pre_action(inputs)
-        self.registry[name]['pre_inputs'] = inputs
+        self._record(name, pre_inputs=inputs)
 
     def _module_post_hook(self, name, inputs, outputs, post_action=None):
-        self.registry[name]['inputs'] = inputs
-        self.registry[name]['outputs'] = outputs
+        self._record(name, inputs=inputs, outputs=outputs)
         if post_action is not None:
             return post_action(outputs)
 
-    def capture_module(self, name, module, pre_action=None, post_action=None):
-        if pre_action is not None:
-            module.register_forward_pre_hook(
-                lambda _, inputs: self._module_pre_hook(name, inputs, pre_action)
-            )
-        module.register_forward_hook(
-            lambda _, inputs, outputs: self._module_post_hook(name, inputs, outputs, post_action)
-        )
+    def capture_module(self, name, module, pre_action=None, post_action=None, policy=None):
+        if policy is not None:
+            self.policies[name] = policy
+
+        def register():
+            handles = []
+            if pre_action is not None:
+                handles.append(module.register_forward_pre_hook(
+                    lambda _, inputs: self._module_pre_hook(name, inputs, pre_action)
+                ))
+            handles.append(module.register_forward_hook(
+                lambda _, inputs, outputs: self._module_post_hook(name, inputs, outputs, post_action)
+            ))
+            return handles
+        return self._capture(name, register)
 
-    def capture_func(self, name, pre_action=None, post_action=None):
+    @contextmanager
+    def capturing(self, name, module, pre_action=None, post_action=None, policy=None):
+        self.capture_module(name, module, pre_action=pre_action, post_action=post_action, policy=policy)
+        try:
+            yield self.registry[name]
+        finally:
+            self.release(name)
+
+    def capture_func(self, name, pre_action=None, post_action=None, record_inputs=True, record_outputs=True, timing=False):
         def decorator(func):
-            def wrapper(*args, **kwargs):
-                if pre_action:
-                    args, kwargs = pre_action(*args, **kwargs)
-                sig = inspect.signature(func)
-                bound_args = sig.bind_partial(*args, **kwargs)
-                bound_args.apply_defaults()
-                inputs = [bound_args.arguments[param.name] for param in sig.parameters.values()]
-                outputs = func(*inputs)
-                if post_action:
-                    outputs = post_action(outputs)
-                self.registry[name]['inputs'] = inputs
-                self.registry[name]['outputs'] = outputs
-                return outputs
+            bind = _make_binder(func)
+            stats = ADict(num_calls=0, total_time=0, last_time=None)
+            self.registry[name]['stats'] = stats
+
+            def record(args, kwargs, outputs, elapsed):
+                stats['num_calls'] += 1
+                if elapsed is not None:
+                    stats['total_time'] += elapsed
+                    stats['last_time'] = elapsed
+                if self.policy is None and name not in self.policies:
+                    entry = self.registry[name]
+                    if record_inputs:
+                        entry['inputs'] = bind(args, kwargs)
+                    if record_outputs:
+                        entry['outputs'] = outputs
+                else:
+                    values = dict()
+                    if record_inputs:
+                        values['inputs'] = bind(args, kwargs)
+                    if record_outputs:
+                        values['outputs'] = outputs
+                    self._record(name, **values)
+
+            if pre_action is None and post_action is None and not timing:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    outputs = func(*args, **kwargs)
+                    if self.enabled and Hook.GLOBAL_ENABLED:
+                        record(args, kwargs, outputs, None)
+                    return outputs
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    if not (self.enabled and Hook.GLOBAL_ENABLED):
+                        return func(*args, **kwargs)
+                    if pre_action:
+                        args, kwargs = pre_action(*args, **kwargs)
+                    start = time.perf_counter_ns() if timing else None
+                    outputs = func(*args, **kwargs)
+                    elapsed = time.perf_counter_ns()-start if timing else None
+                    if post_action:
+                        outputs = post_action(outputs)
+                    record(args, kwargs, outputs, elapsed)
+                    return outputs
             return wrapper
         return decorator
@@ -1,20 +1,140 @@
+from contextlib import nullcontext
+
+import torch
+from torch import nn
+
+
+def _module_device(module):
+    for tensor in module.parameters():
+        return tensor.device
+    for tensor in module.buffers():
+        return tensor.device
+
+
+def _get(module, getter):
+    return getattr(module, getter) if isinstance(getter, str) else getter(module)
+
+
+class ConversionRule:
+    def __init__(
+        self,
+        match,
+        factory,
+        init_kwargs_mapping=None,
+        attrs_mapping=None,
+        keep_children=False,
+        meta_init=False,
+        **kwargs
+    ):
+        self.match = match
+        self.factory = factory
+        self.init_kwargs_mapping = init_kwargs_mapping or dict()
+        self.attrs_mapping = attrs_mapping or dict()
+        self.keep_children = keep_children
+        self.meta_init = meta_init
+        self.kwargs = kwargs
+
+    def matches(self, module):
+        if isinstance(self.match, (type, tuple)):
+            return isinstance(module, self.match)
+        return self.match(module)
+
+    def convert(self, module):
+        kwargs = dict(self.kwargs)
+        kwargs.update({key: _get(module, getter) for key, getter in self.init_kwargs_mapping.items()})
+        device = _module_device(module)
+        # constructing on meta skips allocating parameters that the attribute mapping overwrites anyway
+        if self.meta_init:
+            device_context = torch.device('meta')
+        else:
+            device_context = nullcontext() if device is None else torch.device(device)
+        with device_context:
+            converted_module = self.factory(**kwargs)
+        for getter, dst_attr_name in self.attrs_mapping.items():
+            # parameters and buffers are moved over as objects, never copied
+            setattr(converted_module, dst_attr_name, _get(module, getter))
+        if self.keep_children:
+            for name, child in module.named_children():
+                converted_module._modules[name] = child
+        if self.meta_init and (device is None or device.type != 'meta'):
+            # a source without tensors gives no device, the new tensors land where torch allocates by default
+            self._materialize(converted_module, torch.empty(()).device if device is None else device)
+        return converted_module
+
+    @staticmethod
+    @torch.no_grad()
+    def _materialize(module, device):
+        for submodule in module.modules():
+            tensors = list(submodule.parameters(recurse=False))+list(submodule.buffers(recurse=False))
+            # only modules whose own tensors were not all supplied by the attribute mapping are initialized
+            if not any(tensor.is_meta for tensor in tensors):
+                continue
+            supplied = []
+            for slots in (submodule._parameters, submodule._buffers):
+                for name, tensor in list(slots.items()):
+                    if tensor is None:
+                        continue
+                    if not tensor.is_meta:
+                        # supplied tensors are shared with the source module, reset_parameters writes to scratch
+                        supplied.append((slots, name, tensor))
+                    scratch = torch.empty_like(tensor, device=device if tensor.is_meta else tensor.device)
+                    if isinstance(tensor, nn.Parameter):
+                        scratch = nn.Parameter(scratch, requires_grad=tensor.requires_grad)
+                    slots[name] = scratch
+            if hasattr(submodule, 'reset_parameters'):
+                submodule.reset_parameters()
+            for slots, name, tensor in supplied:
+                slots[name] = tensor
+
+
+class LayerConverter:
+    def __init__(self, rules=None):
+        self.rules = list(rules or [])
+
+    def register(self, match, factory, init_kwargs_mapping=None, attrs_mapping=None, **kwargs):
+        self.rules.append(ConversionRule(match, factory, init_kwargs_mapping, attrs_mapping, **kwargs))
+        return self
+
+    def _find_rule(self, module):
+        for rule in self.rules:
+            if rule.matches(module):
+                return rule
+
+    def convert(self, module):
+        report = []
+        converted = dict()
+
+        def convert_one(name, child):
+            # shared modules are converted once and the same replacement is reused everywhere
+            if id(child) in converted:
+                return converted[id(child)]
+            rule = self._find_rule(child)
+            new_child = child if rule is None else rule.convert(child)
+            if rule is not None:
+                report.append((name, child.__class__.__name__, new_child.__class__.__name__))
+            converted[id(child)] = new_child
+            return new_child
+
+        root = convert_one('', module)
+        visited = set()
+        stack = [('', module, root)]
+        while stack:
+            prefix, original, parent = stack.pop()
+            if id(parent) in visited:
+                continue
+            visited.add(id(parent))
+            for name, child in list(parent._modules.items()):
+                # submodules a factory built are never walked, only the ones the original module already had
+                if child is None or (parent is not original and original._modules.get(name) is not child):
+                    continue
+                qualified_name = f'{prefix}.{name}' if prefix else name
+                new_child = convert_one(qualified_name, child)
+                if new_child is not child:
+                    parent._modules[name] = new_child
+                stack.append((qualified_name, child, new_child))
+        return root, report
+
+
 def convert_all_layers(module, src, dst, init_kwargs_mapping, attrs_mapping, **kwargs):
-    converted_module = module
-    if isinstance(module, src):
-        kwargs.update({
-            key: getattr(module, getter) if isinstance(getter, str) else getter(module)
-            for key, getter in init_kwargs_mapping.items()
-        })
-        converted_module = dst(**kwargs)
-        for getter, dst_attr_name in attrs_mapping.items():
-            setattr(
-                converted_module,
-                dst_attr_name,
-                getattr(module, getter) if isinstance(getter, str) else getter(module)
-            )
-    for name, child in module.named_children():
-        converted_module.add_module(
-            name, convert_all_layers(child, src, dst, init_kwargs_mapping, attrs_mapping, **kwargs)
-        )
-    del module
-    return converted_module
+    converter = LayerConverter().register(src, dst, init_kwargs_mapping, attrs_mapping, keep_children=True, **kwargs)
+    return converter.convert(module)[0]
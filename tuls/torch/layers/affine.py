@@ -1,38 +1,60 @@
 from functools import partial
+from typing import Dict, List, Optional
 
 import torch
 from torch import nn
 
 
 class Affine(nn.Module):
-    def __init__(self, num_features, bias=True):
+    # rank -> feature dim found by the last search, rank-dim-1 -> broadcast shape of weight and bias
+    dim: Optional[int]
+    _dims: Dict[int, int]
+    _shapes: Dict[int, List[int]]
+
+    def __init__(self, num_features, bias=True, dim: Optional[int] = None):
         super().__init__()
         self.num_features = num_features
+        self.dim = dim
         self.weight = nn.Parameter(torch.ones(num_features))
         if bias:
             self.bias = nn.Parameter(torch.zeros(num_features))
         else:
-            self.bias = None
+            self.register_parameter('bias', None)
+        self._dims = dict()
+        self._shapes = dict()
 
-    def forward(self, x, dim=None):
-        size = x.size()
-        weight = self.weight
-        bias = self.bias
-        # guess dimension to apply
+    def _resolve_dim(self, x: torch.Tensor, dim: Optional[int]) -> int:
+        rank = x.dim()
         if dim is None:
-            # iterate except batch dim
-            for index, d in enumerate(size[1:]):
-                if d == self.num_features:
-                    dim = index
-                    break
-            else:
-                raise ValueError('There is no dimension to apply Affine module.')
-        weight = weight.view(*[-1 if index == dim else 1 for index in range(len(size))])
-        x = weight*x
-        if self.bias is not None:
-            bias = bias.view(*[-1 if index == dim else 1 for index in range(len(size))])
-            x = x+bias
-        return x
+            dim = self.dim
+        if dim is not None:
+            return dim+rank if dim < 0 else dim
+        if rank in self._dims:
+            cached = self._dims[rank]
+            if x.size(cached) == self.num_features:
+                return cached
+        # guess dimension to apply, skipping batch dim
+        for index in range(1 if rank > 1 else 0, rank):
+            if x.size(index) == self.num_features:
+                self._dims[rank] = index
+                return index
+        raise ValueError('There is no dimension to apply Affine module.')
+
+    def _broadcast_shape(self, num_trailing_dims: int) -> List[int]:
+        if num_trailing_dims not in self._shapes:
+            self._shapes[num_trailing_dims] = [-1]+[1]*num_trailing_dims
+        return self._shapes[num_trailing_dims]
+
+    def forward(self, x, dim: Optional[int] = None):
+        shape = self._broadcast_shape(x.dim()-self._resolve_dim(x, dim)-1)
+        weight = self.weight.view(shape)
+        bias = self.bias
+        if bias is None:
+            return x*weight
+        bias = bias.view(shape)
+        if x.dtype == weight.dtype:
+            return torch.addcmul(bias, x, weight)
+        return x*weight+bias
 
 
 LayerScale = partial(Affine, bias=False)
@@ -0,0 +1,152 @@
+import copy
+
+import torch
+from torch import nn
+
+from tuls.torch import _collect_tensors
+from tuls.torch.layers.affine import Affine
+
+_CONV_TYPES = (nn.Conv1d, nn.Conv2d, nn.Conv3d)
+_CONV_TRANSPOSE_TYPES = (nn.ConvTranspose1d, nn.ConvTranspose2d, nn.ConvTranspose3d)
+_NORM_TYPES = (nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d, nn.GroupNorm, nn.LayerNorm)
+
+
+def _channel_view(values, dim, ndim):
+    return values.view(*[-1 if index == dim else 1 for index in range(ndim)])
+
+
+def _ensure_bias(module, num_features):
+    if module.bias is None:
+        weight = module.weight
+        module.bias = nn.Parameter(torch.zeros(num_features, dtype=weight.dtype, device=weight.device))
+    return module.bias
+
+
+def _output_features(layer):
+    if isinstance(layer, nn.Linear):
+        return layer.out_features
+    elif isinstance(layer, _CONV_TYPES+_CONV_TRANSPOSE_TYPES):
+        return layer.out_channels
+    elif isinstance(layer, nn.GroupNorm):
+        return layer.num_channels if layer.affine else None
+    elif isinstance(layer, nn.LayerNorm):
+        if layer.elementwise_affine and len(layer.normalized_shape) == 1:
+            return layer.normalized_shape[0]
+    elif isinstance(layer, nn.modules.batchnorm._BatchNorm):
+        return layer.num_features if layer.affine else None
+
+
+def _affine_axis_is(affine, axis):
+    # axis is 1 for channels-first layers and -1 for layers acting on the last dimension
+    if affine.dim is not None:
+        return affine.dim == axis
+    if affine._dims:
+        # a forward pass, such as the reference run on example inputs, recorded where the axis was found per rank
+        return all((dim-rank if axis < 0 else dim) == axis for rank, dim in affine._dims.items())
+    # the guess takes the first matching dimension after the batch, which is the channel dimension for
+    # channels-first layers but may be any earlier dimension of the same size for the last one
+    return axis == 1
+
+
+@torch.no_grad()
+def fold_affine_into_previous(layer, affine):
+    if _output_features(layer) != affine.num_features:
+        return False
+    if not _affine_axis_is(affine, -1 if isinstance(layer, (nn.Linear, nn.LayerNorm)) else 1):
+        return False
+    scale, shift = affine.weight, affine.bias
+    if isinstance(layer, _CONV_TRANSPOSE_TYPES):
+        if layer.groups != 1:
+            return False
+        layer.weight.mul_(_channel_view(scale, 1, layer.weight.dim()))
+    elif isinstance(layer, _NORM_TYPES):
+        layer.weight.mul_(scale)
+        if shift is not None and layer.bias is None:
+            _ensure_bias(layer, affine.num_features)
+    else:
+        layer.weight.mul_(_channel_view(scale, 0, layer.weight.dim()))
+    if layer.bias is not None:
+        layer.bias.mul_(scale)
+    if shift is not None:
+        _ensure_bias(layer, affine.num_features).add_(shift)
+    return True
+
+
+@torch.no_grad()
+def fold_affine_into_next(affine, layer):
+    if not _affine_axis_is(affine, -1 if isinstance(layer, nn.Linear) else 1):
+        return False
+    scale, shift = affine.weight, affine.bias
+    if isinstance(layer, nn.Linear):
+        if layer.in_features != affine.num_features:
+            return False
+        if shift is not None:
+            _ensure_bias(layer, layer.out_features).add_(layer.weight@shift)
+        layer.weight.mul_(scale.view(1, -1))
+        return True
+    elif isinstance(layer, _CONV_TYPES):
+        if layer.groups != 1 or layer.in_channels != affine.num_features:
+            return False
+        # zero padding would see the shifted value inside the conv but zeros outside, so only shifts without padding fold
+        if shift is not None and layer.padding != 'valid' and (layer.padding == 'same' or any(layer.padding)):
+            return False
+        if shift is not None:
+            shifted = layer.weight*_channel_view(shift, 1, layer.weight.dim())
+            _ensure_bias(layer, layer.out_channels).add_(shifted.sum(dim=tuple(range(1, layer.weight.dim()))))
+        layer.weight.mul_(_channel_view(scale, 1, layer.weight.dim()))
+        return True
+    return False
+
+
+def _is_identity(affine):
+    return bool((affine.weight == 1).all()) and (affine.bias is None or bool((affine.bias == 0).all()))
+
+
+def _fuse_sequential(sequential, report):
+    names = list(sequential._modules)
+    for index, name in enumerate(names):
+        module = sequential._modules[name]
+        if not isinstance(module, Affine):
+            continue
+        previous = sequential._modules[names[index-1]] if index > 0 else None
+        following = sequential._modules[names[index+1]] if index+1 < len(names) else None
+        if previous is not None and not isinstance(previous, Affine) and fold_affine_into_previous(previous, module):
+            report.append((name, 'previous'))
+        elif following is not None and not isinstance(following, Affine) and fold_affine_into_next(module, following):
+            report.append((name, 'next'))
+        elif _is_identity(module):
+            report.append((name, 'identity'))
+        else:
+            continue
+        sequential._modules[name] = nn.Identity()
+
+
+def fuse_affine_layers(model, example_inputs=None, inplace=False, rtol=1e-4, atol=1e-5):
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.eval()
+    reference = None
+    if example_inputs is not None:
+        with torch.no_grad():
+            reference = model(*example_inputs)
+    report = []
+    for name, module in list(model.named_modules()):
+        if isinstance(module, nn.Sequential):
+            sequential_report = []
+            _fuse_sequential(module, sequential_report)
+            report.extend((f'{name}.{child_name}' if name else child_name, how) for child_name, how in sequential_report)
+    if reference is not None:
+        with torch.no_grad():
+            outputs = model(*example_inputs)
+        check_equivalence(reference, outputs, rtol=rtol, atol=atol)
+    return model, report
+
+
+def check_equivalence(reference, outputs, rtol=1e-4, atol=1e-5):
+    reference_tensors, output_tensors = [], []
+    _collect_tensors(reference, reference_tensors)
+    _collect_tensors(outputs, output_tensors)
+    for reference_tensor, output_tensor in zip(reference_tensors, output_tensors):
+        if not torch.allclose(output_tensor, reference_tensor, rtol=rtol, atol=atol):
+            max_error = (output_tensor-reference_tensor).abs().max().item()
+            raise ValueError(f'Fused model differs from original model, max absolute error is {max_error}.')
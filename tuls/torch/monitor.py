@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+import torch
+
+from tuls.metric.logger import Metric
+from tuls.torch import get_named_parameters
+
+
+class GradientMonitor:
+    def __init__(self, modules, every_n_steps=1, update_ratio=True, per_parameter=True, max_size=None):
+        self.named_parameters = {
+            name: parameter for name, parameter in get_named_parameters(modules).items() if parameter.requires_grad
+        }
+        self.every_n_steps = every_n_steps
+        self.update_ratio = update_ratio
+        self.per_parameter = per_parameter
+        self.max_size = max_size
+        self.metrics = dict()
+        self.num_steps = 0
+        self.snapshots = dict()
+
+    def _metric(self, name):
+        if name not in self.metrics:
+            self.metrics[name] = Metric(max_size=self.max_size)
+        return self.metrics[name]
+
+    def is_sampling(self):
+        return self.num_steps % self.every_n_steps == 0
+
+    def _groups(self, with_grad):
+        groups = defaultdict(list)
+        for name, parameter in self.named_parameters.items():
+            if not with_grad or parameter.grad is not None:
+                groups[parameter.device].append(name)
+        return groups
+
+    @torch.no_grad()
+    def _snapshot(self):
+        # preallocated buffers are refilled with one fused copy per device on every sampled step
+        snapshots = dict()
+        for device, names in self._groups(with_grad=True).items():
+            parameters = [self.named_parameters[name] for name in names]
+            buffers = [self.snapshots.get(name) for name in names]
+            if any(buffer is None for buffer in buffers):
+                buffers = [torch.empty_like(parameter) for parameter in parameters]
+                self.snapshots.update(zip(names, buffers))
+            torch._foreach_copy_(buffers, parameters)
+            snapshots[device] = buffers
+        return snapshots
+
+    @torch.no_grad()
+    def _collect(self, snapshots=None):
+        # every norm stays on its device, each device is synchronized and copied to the host once
+        results = dict()
+        for device, names in self._groups(with_grad=True).items():
+            parameters = [self.named_parameters[name] for name in names]
+            rows = [torch.stack(torch._foreach_norm([parameter.grad for parameter in parameters])).float()]
+            if snapshots is not None:
+                updates = torch._foreach_sub(parameters, snapshots[device])
+                rows.append(torch.stack(torch._foreach_norm(snapshots[device])).float())
+                rows.append(torch.stack(torch._foreach_norm(updates)).float())
+            else:
+                rows.append(torch.stack(torch._foreach_norm(parameters)).float())
+            results[device] = (names, torch.stack(rows).cpu())
+        return results
+
+    def _report(self, results, with_update):
+        global_grad = global_weight = global_update = 0.0
+        for names, values in results.values():
+            grad_norms, weight_norms = values[0].tolist(), values[1].tolist()
+            update_norms = values[2].tolist() if with_update else None
+            for index, name in enumerate(names):
+                global_grad += grad_norms[index]**2
+                global_weight += weight_norms[index]**2
+                if self.per_parameter:
+                    self._metric(f'grad_norm/{name}').add(grad_norms[index])
+                    self._metric(f'weight_norm/{name}').add(weight_norms[index])
+                if with_update:
+                    global_update += update_norms[index]**2
+                    if self.per_parameter:
+                        self._metric(f'update_ratio/{name}').add(update_norms[index]/(weight_norms[index]+1e-12))
+        self._metric('grad_norm/global').add(global_grad**0.5)
+        self._metric('weight_norm/global').add(global_weight**0.5)
+        if with_update:
+            self._metric('update_ratio/global').add(global_update**0.5/(global_weight**0.5+1e-12))
+
+    @torch.no_grad()
+    def step(self, optimizer=None):
+        sampling = self.is_sampling()
+        self.num_steps += 1
+        if not sampling:
+            if optimizer is not None:
+                optimizer.step()
+            return False
+        with_update = optimizer is not None and self.update_ratio
+        snapshots = None
+        if with_update:
+            snapshots = self._snapshot()
+            optimizer.step()
+        results = self._collect(snapshots)
+        if optimizer is not None and not with_update:
+            optimizer.step()
+        self._report(results, with_update)
+        return True
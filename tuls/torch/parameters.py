@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+import torch
+
+from tuls.torch import get_named_parameters
+
+
+class FlatParameters:
+    def __init__(self, modules, flatten=True, requires_grad_only=True):
+        self.flatten = flatten
+        self.named_parameters = dict()
+        parameter_ids = set()
+        for name, parameter in get_named_parameters(modules).items():
+            if requires_grad_only and not parameter.requires_grad or id(parameter) in parameter_ids:
+                continue
+            parameter_ids.add(id(parameter))
+            self.named_parameters[name] = parameter
+        self.groups = defaultdict(list)
+        for name, parameter in self.named_parameters.items():
+            self.groups[(parameter.dtype, parameter.device)].append(name)
+        # name -> (group key, start, end), computed once and reused by every lookup
+        self.slices = dict()
+        self.flat_parameters = dict()
+        self.flat_grads = dict()
+        self.grad_views = dict()
+        for key, names in self.groups.items():
+            offset = 0
+            for name in names:
+                numel = self.named_parameters[name].numel()
+                self.slices[name] = (key, offset, offset+numel)
+                offset += numel
+            if flatten:
+                self._relocate(key, names, offset)
+        if flatten:
+            self.attach_grads()
+
+    @torch.no_grad()
+    def _relocate(self, key, names, numel):
+        dtype, device = key
+        flat_parameter = torch.empty(numel, dtype=dtype, device=device)
+        flat_grad = torch.zeros_like(flat_parameter)
+        for name in names:
+            parameter = self.named_parameters[name]
+            _, start, end = self.slices[name]
+            flat_parameter[start:end].copy_(parameter.reshape(-1))
+            if parameter.grad is not None:
+                flat_grad[start:end].copy_(parameter.grad.reshape(-1))
+            parameter.data = flat_parameter[start:end].view_as(parameter)
+        self.flat_parameters[key] = flat_parameter
+        self.flat_grads[key] = flat_grad
+
+    @torch.no_grad()
+    def attach_grads(self):
+        # optimizers may reset grads to None, so views into the flat buffers are re-attached on demand
+        if not self.flatten:
+            return
+        for name, parameter in self.named_parameters.items():
+            grad_view = self.grad_views.get(name)
+            if grad_view is None or parameter.grad is not grad_view:
+                key, start, end = self.slices[name]
+                if parameter.grad is not None:
+                    self.flat_grads[key][start:end].copy_(parameter.grad.reshape(-1))
+                else:
+                    self.flat_grads[key][start:end].zero_()
+                grad_view = self.flat_grads[key][start:end].view_as(parameter)
+                parameter.grad = grad_view
+                self.grad_views[name] = grad_view
+
+    def __len__(self):
+        return len(self.named_parameters)
+
+    def get(self, name):
+        if self.flatten:
+            key, start, end = self.slices[name]
+            return self.flat_parameters[key][start:end]
+        return self.named_parameters[name].reshape(-1)
+
+    def get_grad(self, name):
+        if self.flatten:
+            key, start, end = self.slices[name]
+            return self.flat_grads[key][start:end]
+        grad = self.named_parameters[name].grad
+        return None if grad is None else grad.reshape(-1)
+
+    def parameter_tensors(self):
+        if self.flatten:
+            return list(self.flat_parameters.values())
+        return list(self.named_parameters.values())
+
+    def grad_tensors(self):
+        if self.flatten:
+            self.attach_grads()
+            return list(self.flat_grads.values())
+        return [parameter.grad for parameter in self.named_parameters.values() if parameter.grad is not None]
+
+    @torch.no_grad()
+    def zero_grad(self):
+        if self.flatten:
+            for flat_grad in self.flat_grads.values():
+                flat_grad.zero_()
+            self.attach_grads()
+        else:
+            grads = self.grad_tensors()
+            if grads:
+                torch._foreach_zero_(grads)
+
+    @torch.no_grad()
+    def grad_norm(self, norm_type=2.0):
+        grads = self.grad_tensors()
+        if not grads:
+            return torch.tensor(0.)
+        device = grads[0].device
+        norms = torch._foreach_norm(grads, norm_type)
+        norms = torch.stack([norm.to(device=device, dtype=torch.float32) for norm in norms])
+        return torch.linalg.vector_norm(norms, norm_type)
+
+    @torch.no_grad()
+    def clip_grad_norm_(self, max_norm, norm_type=2.0, eps=1e-6):
+        total_norm = self.grad_norm(norm_type)
+        clip_coef = torch.clamp(max_norm/(total_norm+eps), max=1.0)
+        grads_by_device = defaultdict(list)
+        for grad in self.grad_tensors():
+            grads_by_device[grad.device].append(grad)
+        for device, grads in grads_by_device.items():
+            torch._foreach_mul_(grads, clip_coef.to(device))
+        return total_norm
+
+    @torch.no_grad()
+    def update_ema(self, source, decay):
+        if self.slices != source.slices:
+            raise ValueError('source should have same parameters to update EMA.')
+        torch._foreach_lerp_(self.parameter_tensors(), source.parameter_tensors(), 1.0-decay)
+
+    @torch.no_grad()
+    def all_reduce_grads(self, average=True, group=None):
+        import torch.distributed as dist
+
+        world_size = dist.get_world_size(group)
+        grads = self.grad_tensors()
+        for grad in grads:
+            dist.all_reduce(grad, group=group)
+        if average and grads:
+            torch._foreach_div_(grads, world_size)
@@ -0,0 +1,187 @@
+import json
+import time
+from contextlib import contextmanager
+
+import torch
+from beacon.adict import ADict
+
+from tuls.torch import _collect_tensors
+from tuls.torch.hooks import Hook
+
+
+def _num_bytes(value):
+    tensors = []
+    _collect_tensors(value, tensors)
+    return sum(tensor.numel()*tensor.element_size() for tensor in tensors)
+
+
+class ModuleProfiler(Hook):
+    def __init__(self, every_n_steps=1, backward=True, synchronize=False, max_events=100000):
+        super().__init__()
+        self.every_n_steps = every_n_steps
+        self.backward = backward
+        self.synchronize = synchronize
+        self.max_events = max_events
+        self.starts = dict()
+        self.events = []
+        self.num_steps = 0
+        self.active = True
+        self.origin = time.perf_counter_ns()
+
+    def _now(self):
+        if self.synchronize and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return time.perf_counter_ns()
+
+    def _stats(self, name):
+        if name not in self.registry:
+            self.registry[name] = ADict(
+                forward_calls=0,
+                forward_time=0,
+                backward_calls=0,
+                backward_time=0,
+                activation_bytes=0
+            )
+        return self.registry[name]
+
+    def _start(self, key):
+        if self.active:
+            self.starts.setdefault(key, []).append(self._now())
+
+    def _add(self, name, phase, start, end, outputs=None):
+        stats = self._stats(name)
+        stats[f'{phase}_calls'] += 1
+        stats[f'{phase}_time'] += end-start
+        if outputs is not None:
+            stats.activation_bytes += _num_bytes(outputs)
+        if len(self.events) < self.max_events:
+            self.events.append((name, phase, start, end))
+
+    def _stop(self, name, phase, outputs=None):
+        starts = self.starts.get((name, phase))
+        if not starts:
+            return
+        end = self._now()
+        self._add(name, phase, starts.pop(), end, outputs)
+
+    def _watch_backward(self, name, inputs, outputs):
+        input_tensors, output_tensors = [], []
+        _collect_tensors(inputs, input_tensors)
+        _collect_tensors(outputs, output_tensors)
+        input_tensors = [tensor for tensor in input_tensors if tensor.requires_grad]
+        output_tensors = [tensor for tensor in output_tensors if tensor.requires_grad]
+        if not input_tensors or not output_tensors:
+            return
+        # backward of this call starts when a gradient reaches its outputs and ends once every input has one.
+        # an input hook fires only after the whole gradient of that tensor is accumulated, so a module whose
+        # inputs are shared or feed a residual branch is charged the backward of those other consumers as well,
+        # and a module none of whose inputs require grad, usually the first layer, gets no backward time at all
+        call = [None, len(input_tensors)]
+
+        def on_output_grad(grad):
+            if call[0] is None:
+                call[0] = self._now()
+
+        def on_input_grad(grad):
+            call[1] -= 1
+            if call[1] == 0 and call[0] is not None:
+                self._add(name, 'backward', call[0], self._now())
+
+        for tensor in output_tensors:
+            tensor.register_hook(on_output_grad)
+        for tensor in input_tensors:
+            tensor.register_hook(on_input_grad)
+
+    def _forward_hook(self, name, inputs, outputs):
+        self._stop(name, 'forward', outputs)
+        if self.backward and self.active and torch.is_grad_enabled():
+            self._watch_backward(name, inputs, outputs)
+
+    def _register(self, name, module):
+        # tensor hooks leave the autograd graph of the module untouched, unlike module backward hooks
+        # that wrap its outputs in views in-place operations cannot modify
+        return [
+            module.register_forward_pre_hook(lambda _, inputs: self._start((name, 'forward'))),
+            module.register_forward_hook(lambda _, inputs, outputs: self._forward_hook(name, inputs, outputs))
+        ]
+
+    def attach(self, module, filter_fn=None):
+        if self.captures:
+            raise RuntimeError('Profiler is already attached, detach it first.')
+        for name, submodule in module.named_modules():
+            name = name or module.__class__.__name__
+            if filter_fn is not None and not filter_fn(name, submodule):
+                continue
+            self._capture(name, lambda name=name, submodule=submodule: self._register(name, submodule))
+        return self
+
+    def detach(self):
+        self.release()
+        self.starts.clear()
+
+    @contextmanager
+    def profile(self, module, filter_fn=None):
+        self.attach(module, filter_fn)
+        try:
+            yield self
+        finally:
+            self.detach()
+
+    def step(self):
+        self.num_steps += 1
+        self.active = self.num_steps % self.every_n_steps == 0
+        # steps that are not sampled run without any hooks on the modules
+        self.set_enabled(self.active)
+        # calls left open by an exception in the previous step must not leak into this one
+        self.starts.clear()
+
+    def reset(self):
+        self.registry.clear()
+        self.events.clear()
+        self.starts.clear()
+
+    def summary(self, sort_by='total_time'):
+        rows = []
+        for name, stats in self.registry.items():
+            rows.append(ADict(
+                name=name,
+                forward_calls=stats.forward_calls,
+                forward_time=stats.forward_time/1e6,
+                backward_calls=stats.backward_calls,
+                backward_time=stats.backward_time/1e6,
+                total_time=(stats.forward_time+stats.backward_time)/1e6,
+                activation_bytes=stats.activation_bytes/max(stats.forward_calls, 1)
+            ))
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows
+
+    def table(self, sort_by='total_time', top=None):
+        rows = self.summary(sort_by)[:top]
+        name_width = max([len(row.name) for row in rows]+[6])
+        lines = [
+            f'{"Module":<{name_width}} | {"Calls":>7} | {"Forward(ms)":>12} | '
+            f'{"Backward(ms)":>12} | {"Total(ms)":>12} | {"Act/Call(MB)":>12}'
+        ]
+        lines.append('-'*len(lines[0]))
+        for row in rows:
+            lines.append(
+                f'{row.name:<{name_width}} | {row.forward_calls:>7d} | {row.forward_time:>12.3f} | '
+                f'{row.backward_time:>12.3f} | {row.total_time:>12.3f} | {row.activation_bytes/2**20:>12.3f}'
+            )
+        return '\n'.join(lines)
+
+    def export_chrome_trace(self, path):
+        trace_events = [
+            dict(
+                name=name,
+                cat=phase,
+                ph='X',
+                ts=(start-self.origin)/1e3,
+                dur=(end-start)/1e3,
+                pid=0,
+                tid=phase
+            )
+            for name, phase, start, end in self.events
+        ]
+        with open(path, 'w') as f:
+            json.dump(dict(traceEvents=trace_events, displayTimeUnit='ms'), f)